@@ -1,6 +1,30 @@
 from sqlalchemy import Column, Integer, String, Boolean, TIMESTAMP, text, JSON
+from sqlalchemy.types import TypeDecorator
 from db.init import Base
 
+import orjson
+
+class AddonList(TypeDecorator):
+    """JSON column holding the list of addon variation IDs.
+
+    The driver decodes JSON once at load; this normalizes NULL to [] so
+    callers can iterate without a None check, and decodes via orjson on
+    the off chance a raw string comes back. Kept a list (not a set) since
+    the value flows straight into API responses.
+    """
+    impl = JSON
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return []
+        if isinstance(value, (str, bytes)):
+            return orjson.loads(value)
+        return value
+
 class Customer(Base):
     __tablename__ = "customers"
     id = Column(Integer, primary_key=True, index=True)
@@ -18,12 +42,13 @@ class Customer(Base):
     # Square Integration Fields
     square_customer_id = Column(String(255), nullable=True)
     square_subscription_id = Column(String(255), nullable=True)
-    subscription_active = Column(Boolean, default=False)
-    subscription_status = Column(String(50), nullable=True) # ACTIVE, PAUSED, CANCELED, etc.
+    subscription_active = Column(Boolean, default=False, index=True)
+    subscription_status = Column(String(50), nullable=True, index=True) # ACTIVE, PAUSED, CANCELED, etc.
     plan_id = Column(String(50), nullable=True) # mosquito, lawn, bundle
-    plan_variation_id = Column(String(255), nullable=True) # Square Variation ID
+    plan_id_int = Column(Integer, nullable=True, index=True) # typed mirror of plan_id when it holds a SubscriptionPlan.id
+    plan_variation_id = Column(String(255), nullable=True, index=True) # Square Variation ID
     order_template_id = Column(String(255), nullable=True) # Square Order Template ID
-    selected_addons = Column(JSON, nullable=True) # List of selected addon variation IDs
+    selected_addons = Column(AddonList, nullable=True) # List of selected addon variation IDs
     failed_payment_attempts = Column(Integer, default=0)
     subscription_paused_by_schedule = Column(Boolean, default=False)  # True if paused by schedule, not manually
 
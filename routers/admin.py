@@ -3,13 +3,17 @@ from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import List, Optional
+from collections import defaultdict
 import os
+import threading
 import uuid
 import tempfile
 from fpdf import FPDF
 from datetime import datetime, date, timedelta
 from pydantic import BaseModel
 
+from cachetools import TTLCache
+
 from db.init import get_db
 from models.user import Customer, Admin
 from models.subscription import SubscriptionPlan, SubscriptionLog, Invoice, Payment, PaymentMethod
@@ -18,6 +22,76 @@ from utils.deps import get_current_user
 # Simple in-memory cache for stats
 _stats_cache = {"count": 0, "expires": datetime.min}
 
+# Plan and addon lookup tables for the analytics endpoint. They change on
+# the order of weeks (seeded by scripts, not endpoints), but every
+# dashboard load rebuilt them from two queries. Cached as plain-value
+# tuples - never ORM rows, so nothing outlives its session. Call
+# invalidate_analytics_maps() after reseeding the plan/addon tables.
+# TTLCache isn't thread-safe and dashboard loads come in on the request
+# threadpool, so mutations go through the lock.
+_analytics_maps_cache = TTLCache(maxsize=1, ttl=60)
+_analytics_maps_lock = threading.Lock()
+
+def invalidate_analytics_maps() -> None:
+    """Drop the cached plan/addon maps after the tables are reseeded."""
+    with _analytics_maps_lock:
+        _analytics_maps_cache.clear()
+
+def _load_analytics_maps(db: Session) -> dict:
+    """Return the lookup maps the analytics computation needs, cached 60s.
+
+    plan_lookup: plan_variation_id, plan.id (int) AND str(plan.id)
+                 -> (plan_name, plan_cost)
+    addon_price: variation_id -> recurring monthly price (0.0 for ONE_TIME)
+
+    One dict serves every lookup style - Square variation ids, int plan
+    ids, and digit strings can't collide as keys. Int keys pair with
+    Customer.plan_id_int; the str(id) keys cover rows written before the
+    add_plan_id_int backfill ran, whose plan_id_int is still NULL (same
+    fallback the scheduler keeps).
+    """
+    from models.subscription import ItemVariation
+
+    maps = _analytics_maps_cache.get("maps")
+    if maps is not None:
+        return maps
+    with _analytics_maps_lock:
+        # Re-check under the lock: another thread may have just filled it
+        maps = _analytics_maps_cache.get("maps")
+        if maps is not None:
+            return maps
+        plan_rows = db.query(
+            SubscriptionPlan.id,
+            SubscriptionPlan.plan_variation_id,
+            SubscriptionPlan.plan_name,
+            SubscriptionPlan.plan_cost
+        ).all()
+        addon_rows = db.query(
+            ItemVariation.variation_id,
+            ItemVariation.price,
+            ItemVariation.billing_type
+        ).filter(ItemVariation.item_type == "ADDON").all()
+
+        plan_lookup = {}
+        for pid, pvid, name, cost in plan_rows:
+            entry = (name, cost)
+            if pvid:
+                plan_lookup[pvid] = entry
+            plan_lookup[pid] = entry
+            plan_lookup[str(pid)] = entry
+
+        # Resolve the billing-type branch here, once per addon, so the
+        # per-customer loop just sums prices.
+        maps = {
+            "plan_lookup": plan_lookup,
+            "addon_price": {
+                vid: (0.0 if billing_type == "ONE_TIME" else float(price or 0.0))
+                for vid, price, billing_type in addon_rows
+            },
+        }
+        _analytics_maps_cache["maps"] = maps
+    return maps
+
 router = APIRouter(prefix="", tags=["admin"])
 
 class CustomerListItem(BaseModel):
@@ -83,101 +157,88 @@ def get_admin_analytics(
         raise HTTPException(status_code=403, detail="Forbidden")
     
     # Imports for local calculation
-    from models.subscription import SubscriptionPlan, ItemVariation
     from models.user import Customer
-    
-    # 1. Fetch Necessary Data
-    # Get all potential recurring plans
-    all_plans = db.query(SubscriptionPlan).all()
-    # Map variation_id -> Plan Object
-    plan_map = {p.plan_variation_id: p for p in all_plans if p.plan_variation_id}
-    # Map plan_id (str(id)) -> Plan Object (fallback if variation_id missing on customer but plan_id present)
-    plan_id_map = {str(p.id): p for p in all_plans}
 
-    # Get all addons to calculate Addon Revenue
-    all_addons = db.query(ItemVariation).filter(ItemVariation.item_type == "ADDON").all()
-    addon_map = {a.variation_id: a for a in all_addons}
-
-    # active_subscribers_query
-    active_customers = db.query(Customer).filter(
+    # 1. Fetch Necessary Data (lookup maps are cached module-level for 60s)
+    maps = _load_analytics_maps(db)
+    plan_lookup = maps["plan_lookup"]
+    addon_price = maps["addon_price"]
+
+    # active_subscribers_query - only the three columns the loop reads,
+    # streamed in batches instead of hydrating a full ORM object per row.
+    # Count as we aggregate rather than materializing a list for len().
+    active_customers = db.query(
+        Customer.plan_variation_id,
+        Customer.plan_id_int,
+        Customer.plan_id,
+        Customer.selected_addons
+    ).filter(
         Customer.subscription_active == True,
-        Customer.subscription_status == "ACTIVE" 
-    ).all()
+        Customer.subscription_status == "ACTIVE"
+    ).yield_per(1000)
+
+    active_sub_count = 0
 
-    active_sub_count = len(active_customers)
-    
     # 2. Calculate MRR & Distributions
     mrr = 0.0
-    plan_counts = {p.plan_name: 0 for p in all_plans}
-    plan_revenue = {p.plan_name: 0.0 for p in all_plans}
-    
-    # Initialize "Unknown" or "Custom" if needed, but let's stick to defined plans primarily
-    
-    for customer in active_customers:
-        # Determine Base Plan Cost
-        customer_plan_cost = 0.0
-        plan_name = "Unknown Plan"
-        
-        # Try finding plan by variation ID first
-        if customer.plan_variation_id and customer.plan_variation_id in plan_map:
-            plan = plan_map[customer.plan_variation_id]
-            customer_plan_cost = plan.plan_cost
-            plan_name = plan.plan_name
-        # Fallback to plan_id look up
-        elif customer.plan_id and customer.plan_id in plan_id_map:
-            plan = plan_id_map[customer.plan_id]
-            customer_plan_cost = plan.plan_cost
-            plan_name = plan.plan_name
-            
-        # Determine Addons Cost
+    # One dict holding [count, revenue] per plan: each customer touches a
+    # single entry once instead of updating two parallel dicts. Missing
+    # keys are free via defaultdict; zero-customer plans were filtered out
+    # of the charts anyway.
+    plan_stats = defaultdict(lambda: [0, 0.0])
+
+    for plan_variation_id, plan_id_int, plan_id, selected_addons in active_customers:
+        active_sub_count += 1
+
+        # Determine Base Plan: variation ID first, then typed plan id,
+        # then the legacy string plan_id for rows predating the backfill.
+        # One .get() each instead of a membership test plus an index.
+        plan = (plan_lookup.get(plan_variation_id)
+                or plan_lookup.get(plan_id_int)
+                or plan_lookup.get(plan_id))
+        if plan:
+            plan_name, customer_plan_cost = plan
+        else:
+            plan_name, customer_plan_cost = "Unknown Plan", 0.0
+
+        # Determine Addons Cost - prices are pre-resolved per addon, so
+        # this is a pure map/filter/sum pipeline with no Python-level
+        # branching (filter(None) drops unknown ids; dropping 0.0 prices
+        # is harmless in a sum).
         addons_cost = 0.0
-        if customer.selected_addons:
-            for addon_id in customer.selected_addons:
-                if addon_id in addon_map:
-                    if addon_map[addon_id].billing_type != "ONE_TIME":
-                        addons_cost += addon_map[addon_id].price
-        
+        if selected_addons:
+            addons_cost = sum(filter(None, map(addon_price.get, selected_addons)))
+
         total_customer_revenue = customer_plan_cost + addons_cost
-        
+
         # Aggregate
         mrr += total_customer_revenue
-        
-        # Add to distributions (create key if not exists, though we init'd above)
-        if plan_name not in plan_counts:
-            plan_counts[plan_name] = 0
-            plan_revenue[plan_name] = 0.0
-            
-        plan_counts[plan_name] += 1
-        plan_revenue[plan_name] += total_customer_revenue
+        stats = plan_stats[plan_name]
+        stats[0] += 1
+        stats[1] += total_customer_revenue
 
     # Format Plan Distribution & Revenue Distribution
     colors = ["#10b981", "#3b82f6", "#f59e0b", "#ef4444", "#8b5cf6", "#6366f1", "#ec4899"]
     plan_dist = []
     rev_dist = []
-    
-    # Sort by value or name? Let's sort by name for consistency
-    sorted_plans = sorted(plan_counts.keys())
-    
-    for i, name in enumerate(sorted_plans):
-        # Skip if 0? Maybe keep to show 0 if it's a valid plan
-        # Let's skip 0 to keep chart clean
-        if plan_counts[name] == 0:
-            continue
 
+    # Sort by value or name? Let's sort by name for consistency
+    for i, name in enumerate(sorted(plan_stats)):
+        count, revenue = plan_stats[name]
         color = colors[i % len(colors)]
-        
+
         plan_dist.append(PlanDistributionItem(
             name=name,
-            value=plan_counts[name],
+            value=count,
             color=color
         ))
-        
+
         rev_dist.append(PlanDistributionItem(
             name=name,
-            value=int(plan_revenue.get(name, 0)),
+            value=int(revenue),
             color=color
         ))
-        
+
     # 3. Total Customers (Local DB - Existing Logic)
     total_customers = db.query(Customer).count()
     
@@ -195,8 +256,9 @@ def get_admin_analytics(
     growth_map = {str(d): c for d, c in daily_growth}
     
     growth_history = []
-    # Get count before 30 days
-    count_before = db.query(Customer).filter(Customer.created_at < thirty_days_ago).count()
+    # Count before 30 days = total minus everything the daily query just
+    # returned; no need to scan the table a second time for it.
+    count_before = total_customers - sum(growth_map.values())
     current_total = count_before
     
     for i in range(31):
@@ -759,6 +821,7 @@ def admin_change_subscription(
     plan = db.query(SubscriptionPlan).filter(SubscriptionPlan.plan_variation_id == request.new_plan_variation_id).first()
     if plan:
         customer.plan_id = str(plan.id)
+        customer.plan_id_int = plan.id
         customer.plan_variation_id = request.new_plan_variation_id
         customer.selected_addons = request.addons # We store ALL addons selected (even if one-time processed) for record, or maybe just recurring?
         # Typically selected_addons in customer profile implies ACTIVE recurring addons.
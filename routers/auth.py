@@ -54,6 +54,7 @@ def signup(request: SignUpRequest, db: Session = Depends(get_db)):
         existing_user.city = request.city
         existing_user.zip_code = request.zip
         existing_user.plan_id = request.plan
+        existing_user.plan_id_int = int(request.plan) if request.plan.isdigit() else None
         existing_user.plan_variation_id = request.planVariationId
         existing_user.skeeterman_number = request.skeetermanNumber
         existing_user.selected_addons = request.addons
@@ -72,6 +73,7 @@ def signup(request: SignUpRequest, db: Session = Depends(get_db)):
             city=request.city,
             zip_code=request.zip,
             plan_id=request.plan,
+            plan_id_int=int(request.plan) if request.plan.isdigit() else None,
             plan_variation_id=request.planVariationId,
             skeeterman_number=request.skeetermanNumber,
             selected_addons=request.addons
@@ -82,7 +84,15 @@ def signup(request: SignUpRequest, db: Session = Depends(get_db)):
         db.refresh(new_customer)
     
     # Generate token so they are logged in after signup
-    access_token = create_access_token(data={"sub": new_customer.email, "id": new_customer.id})
+    # Embed the hot identity fields so most handlers can work off the token
+    # without a DB round-trip
+    access_token = create_access_token(data={
+        "sub": new_customer.email,
+        "id": new_customer.id,
+        "role": "customer",
+        "first_name": new_customer.first_name,
+        "last_name": new_customer.last_name
+    })
     
     return {
         "message": "User created successfully", 
@@ -104,7 +114,13 @@ def login(request: LoginRequest, db: Session = Depends(get_db)):
     if not user or not verify_password(request.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    access_token = create_access_token(data={"sub": user.email, "id": user.id})
+    access_token = create_access_token(data={
+        "sub": user.email,
+        "id": user.id,
+        "role": "customer",
+        "first_name": user.first_name,
+        "last_name": user.last_name
+    })
     return {"access_token": access_token, "token_type": "bearer", "user": {
         "id": user.id,
         "email": user.email,
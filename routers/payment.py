@@ -703,6 +703,7 @@ def activate_sub(request: ActivateSubscriptionRequest, db: Session = Depends(get
         # Explicitly assign their plan in case they migrated from one-time or had an error during initial signup
         if plan:
             customer.plan_id = str(plan.id)
+            customer.plan_id_int = plan.id
             customer.plan_variation_id = plan.plan_variation_id
 
         db.commit()
@@ -0,0 +1,42 @@
+from sqlalchemy import text
+import sys
+import os
+
+# Add parent directory to path to import db
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.init import engine
+
+# Indexes backing the analytics/scheduler driver queries on customers.
+# The composite one is partial: the hot filter is always
+# subscription_active = TRUE AND subscription_status = 'ACTIVE', so the
+# index only has to cover the active slice of the table.
+INDEXES = [
+    ("ix_customers_active_status",
+     "CREATE INDEX IF NOT EXISTS ix_customers_active_status "
+     "ON customers (subscription_active, subscription_status) "
+     "WHERE subscription_active"),
+    ("ix_customers_plan_variation_id",
+     "CREATE INDEX IF NOT EXISTS ix_customers_plan_variation_id "
+     "ON customers (plan_variation_id)"),
+    ("ix_customers_subscription_status",
+     "CREATE INDEX IF NOT EXISTS ix_customers_subscription_status "
+     "ON customers (subscription_status)"),
+]
+
+def add_indexes():
+    with engine.connect() as conn:
+        for name, ddl in INDEXES:
+            print(f"Creating index '{name}'...")
+            try:
+                conn.execute(text(ddl))
+                conn.commit()
+                print(f"Index '{name}' is in place.")
+            except Exception as e:
+                if "already exists" in str(e).lower():
+                    print(f"Index '{name}' already exists.")
+                else:
+                    print(f"Error creating index '{name}': {e}")
+
+if __name__ == "__main__":
+    add_indexes()
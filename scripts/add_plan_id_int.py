@@ -0,0 +1,45 @@
+from sqlalchemy import text
+import sys
+import os
+
+# Add parent directory to path to import db
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.init import engine
+
+def add_column():
+    print("Attempting to add 'plan_id_int' column to 'customers' table...")
+    with engine.connect() as conn:
+        try:
+            conn.execute(text("ALTER TABLE customers ADD COLUMN plan_id_int INTEGER"))
+            conn.commit()
+            print("Successfully added 'plan_id_int' column.")
+        except Exception as e:
+            if "duplicate column" in str(e).lower() or "already exists" in str(e).lower():
+                print("Column 'plan_id_int' already exists.")
+            else:
+                print(f"Error adding column: {e}")
+                return
+
+        try:
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_customers_plan_id_int ON customers (plan_id_int)"))
+            conn.commit()
+            print("Index 'ix_customers_plan_id_int' is in place.")
+        except Exception as e:
+            print(f"Error creating index: {e}")
+
+        # Backfill from the legacy string column. Only rows whose plan_id is
+        # purely numeric refer to a SubscriptionPlan.id; names like
+        # "one-time" stay NULL and keep resolving through plan_id.
+        try:
+            result = conn.execute(text(
+                "UPDATE customers SET plan_id_int = CAST(plan_id AS INTEGER) "
+                "WHERE plan_id_int IS NULL AND plan_id ~ '^[0-9]+$'"
+            ))
+            conn.commit()
+            print(f"Backfilled plan_id_int for {result.rowcount} customers.")
+        except Exception as e:
+            print(f"Error backfilling plan_id_int: {e}")
+
+if __name__ == "__main__":
+    add_column()
@@ -0,0 +1,94 @@
+from sqlalchemy import text
+import sys
+import os
+
+# Add parent directory to path to import db
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.init import engine
+
+# Materializes the analytics aggregate so dashboard/monitoring reads are a
+# handful of rows instead of a scan of customers. Same tagged UNION ALL
+# shape verify_analytics.py computes live: a 'total' row (all customers +
+# active count), one 'plan' row per plan, and an 'addon' row.
+#
+# Refresh it from cron, e.g. every 5 minutes:
+#   */5 * * * * cd /path/to/project && python scripts/create_mrr_summary_view.py --refresh
+# The unique index is what lets REFRESH ... CONCURRENTLY work, so reads
+# don't block during a refresh.
+# The name column is COALESCE'd to '' instead of left NULL: REFRESH ...
+# CONCURRENTLY needs a unique index on plain columns (no expressions),
+# so the view itself has to make (tag, name) unique-indexable.
+# No-addon customers store JSON null (the column persists attribute-level
+# None as 'null', not SQL NULL); the CASE in the addon branch feeds those
+# rows an empty array since unnesting a scalar is an error.
+VIEW_SQL = """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS mrr_summary AS
+    SELECT 'total' AS tag, '' AS name, COUNT(*)::float8 AS n,
+           COUNT(*) FILTER (
+               WHERE subscription_active AND subscription_status = 'ACTIVE'
+           )::float8 AS amount
+    FROM customers
+    UNION ALL
+    SELECT 'plan', COALESCE(sp.plan_name, ''), COUNT(c.id)::float8, SUM(sp.plan_cost)::float8
+    FROM subscription_plans sp
+    JOIN customers c
+      ON c.plan_variation_id = sp.plan_variation_id
+      OR c.plan_id = CAST(sp.id AS VARCHAR)
+    WHERE c.subscription_active AND c.subscription_status = 'ACTIVE'
+    GROUP BY sp.plan_name
+    UNION ALL
+    SELECT 'addon', '', NULL, COALESCE(SUM(iv.price), 0)::float8
+    FROM customers c,
+         jsonb_array_elements_text(
+             CASE WHEN jsonb_typeof(c.selected_addons::jsonb) = 'array'
+                  THEN c.selected_addons::jsonb
+                  ELSE '[]'::jsonb END
+         ) AS a(variation_id)
+    JOIN item_variations iv ON iv.variation_id = a.variation_id
+    WHERE c.subscription_active
+      AND c.subscription_status = 'ACTIVE'
+      AND iv.item_type = 'ADDON'
+"""
+
+INDEX_SQL = """
+    CREATE UNIQUE INDEX IF NOT EXISTS ux_mrr_summary_tag_name
+    ON mrr_summary (tag, name)
+"""
+
+def create_view():
+    with engine.connect() as conn:
+        print("Creating materialized view 'mrr_summary'...")
+        try:
+            conn.execute(text(VIEW_SQL))
+            conn.commit()
+            print("View 'mrr_summary' is in place.")
+        except Exception as e:
+            if "already exists" in str(e).lower():
+                print("View 'mrr_summary' already exists.")
+            else:
+                print(f"Error creating view: {e}")
+                return
+        try:
+            conn.execute(text(INDEX_SQL))
+            conn.commit()
+            print("Unique index 'ux_mrr_summary_tag_name' is in place.")
+        except Exception as e:
+            print(f"Error creating index: {e}")
+
+def refresh_view():
+    with engine.connect() as conn:
+        print("Refreshing 'mrr_summary'...")
+        try:
+            conn.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY mrr_summary"))
+            conn.commit()
+            print("Refreshed.")
+        except Exception as e:
+            print(f"Error refreshing view: {e}")
+            sys.exit(1)  # let cron/monitoring see the failure
+
+if __name__ == "__main__":
+    if "--refresh" in sys.argv:
+        refresh_view()
+    else:
+        create_view()
@@ -38,9 +38,9 @@ def main():
     parser.add_argument('--dry-run', action='store_true', help='Only log changes, do not apply them')
     args = parser.parse_args()
     
-    current_month = datetime.now().month
+    now = datetime.now()
     logger.info("=" * 60)
-    logger.info(f"SUBSCRIPTION SCHEDULER - {MONTH_NAMES[current_month]} {datetime.now().year}")
+    logger.info(f"SUBSCRIPTION SCHEDULER - {MONTH_NAMES[now.month]} {now.year}")
     logger.info("=" * 60)
     
     if args.dry_run:
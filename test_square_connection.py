@@ -1,5 +1,7 @@
 import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 
 # Load environment variables from .env
@@ -8,10 +10,24 @@ load_dotenv()
 SQUARE_ACCESS_TOKEN = os.getenv("SQUARE_ACCESS_TOKEN")
 SQUARE_ENVIRONMENT = os.getenv("SQUARE_ENVIRONMENT", "sandbox")
 
+# Module-level session so repeated calls reuse the same TCP+TLS connection
+# instead of paying a fresh handshake per request.
+_session = requests.Session()
+_session.headers.update({
+    "Square-Version": "2024-01-18",
+    "Authorization": f"Bearer {SQUARE_ACCESS_TOKEN}",
+    "Content-Type": "application/json"
+})
+_session.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+))
+
 def test_square_connection():
     print(f"Testing Square connection...")
     print(f"Environment: {SQUARE_ENVIRONMENT}")
-    
+
     if not SQUARE_ACCESS_TOKEN:
         print("Error: SQUARE_ACCESS_TOKEN is not set in .env file.")
         return
@@ -19,17 +35,11 @@ def test_square_connection():
     # Square API Base URLs
     base_url = "https://connect.squareupsandbox.com" if SQUARE_ENVIRONMENT.lower() == "sandbox" else "https://connect.squareup.com"
     url = f"{base_url}/v2/locations"
-    
-    headers = {
-        "Square-Version": "2024-01-18",
-        "Authorization": f"Bearer {SQUARE_ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
 
     try:
         print(f"Sending request to: {url}")
-        response = requests.get(url, headers=headers, timeout=10)
-        
+        response = _session.get(url, timeout=10)
+
         if response.status_code == 200:
             data = response.json()
             locations = data.get("locations", [])
@@ -40,7 +50,7 @@ def test_square_connection():
         else:
             print(f"Connection Failed! Status Code: {response.status_code}")
             print(f"Response: {response.text}")
-            
+
     except Exception as e:
         print(f"An error occurred: {str(e)}")
 
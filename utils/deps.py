@@ -1,6 +1,7 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import jwt, JWTError
+import jwt
+from jwt import InvalidTokenError as JWTError
 from sqlalchemy.orm import Session
 from db.init import get_db
 from models.user import Customer
@@ -10,11 +11,14 @@ security = HTTPBearer()
 
 SECRET_KEY = os.getenv("JWT_SECRET", "supersecretkey")
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+# Built once - avoids allocating a fresh list on every request just to pass
+# the same single algorithm to jwt.decode.
+_ALGORITHMS = (ALGORITHM,)
 
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=_ALGORITHMS)
         email: str = payload.get("sub")
         if email is None:
             raise HTTPException(status_code=401, detail="Invalid token")
@@ -22,9 +26,21 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-def get_db_user(current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_db_user(request: Request, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
     user_id = current_user.get("id")
-    user = db.query(Customer).filter(Customer.id == user_id).first()
+    # FastAPI already caches this dependency within a single request, but
+    # helpers called outside the dependency graph (e.g. from background work
+    # kicked off by the handler) can reuse the row via request.state instead
+    # of triggering another lookup.
+    cached = getattr(request.state, "user", None)
+    if cached is not None and cached.id == user_id:
+        return cached
+    # Session.get() hits the identity map first, so repeated lookups of the
+    # same user within a request don't re-query the DB. Handlers that only
+    # need identity/role should depend on get_current_user instead - those
+    # fields ride along in the token payload.
+    user = db.get(Customer, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    request.state.user = user
     return user
@@ -1,249 +1,315 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 from fpdf import FPDF
-import tempfile
-from fastapi.responses import FileResponse
+from fastapi import Response
 from datetime import datetime
 
-def generate_invoice_pdf(invoice, customer, plan_name="Subscription Service"):
-    pdf = FPDF()
-    pdf.add_page()
-    
-    # Colors
-    primary_color = (220, 38, 38) # Skeeter Red
-    text_color = (31, 41, 55)     # Dark Gray
-    
-    # Header
+# Colors
+PRIMARY_COLOR = (220, 38, 38) # Skeeter Red
+TEXT_COLOR = (31, 41, 55)     # Dark Gray
+
+# Shared cache of parsed font metrics. FPDF rebuilds core font objects on every
+# set_font() call per document; since both generators use the same handful of
+# Helvetica (style, size) combos, we keep the parsed fonts from previous
+# documents and splice them into each new instance so repeat generations skip
+# the metrics rebuild.
+_font_cache = {}
+
+class CachingFPDF(FPDF):
+    """FPDF that drops redundant graphics-state changes.
+
+    FPDF emits a fresh operator into the content stream on every set_*
+    call even when the value is unchanged, and the generators toggle
+    fonts/colors between almost every cell. Early-returning when the
+    requested state matches the active one skips the Python work and
+    keeps the rg/RG/Tf operators out of the output stream.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._active_state = {}
+
+    def _is_active(self, key, value):
+        if self._active_state.get(key) == value:
+            return True
+        self._active_state[key] = value
+        return False
+
+    def add_page(self, *args, **kwargs):
+        # A new page resets the graphics state
+        self._active_state.clear()
+        super().add_page(*args, **kwargs)
+
+    def set_font(self, family=None, style="", size=0):
+        if self._is_active("font", (family, style, size)):
+            return
+        super().set_font(family, style, size)
+
+    def set_text_color(self, r, g=-1, b=-1):
+        if self._is_active("text_color", (r, g, b)):
+            return
+        super().set_text_color(r, g, b)
+
+    def set_fill_color(self, r, g=-1, b=-1):
+        if self._is_active("fill_color", (r, g, b)):
+            return
+        super().set_fill_color(r, g, b)
+
+    def set_draw_color(self, r, g=-1, b=-1):
+        if self._is_active("draw_color", (r, g, b)):
+            return
+        super().set_draw_color(r, g, b)
+
+def _new_pdf():
+    pdf = CachingFPDF()
+    pdf.fonts.update(_font_cache)
+    return pdf
+
+def _cache_fonts(pdf):
+    _font_cache.update(pdf.fonts)
+
+def _render_static_header(pdf, left_title, right_title):
+    """Render the shared brand header and the gray details box.
+
+    This block is byte-identical between the invoice and receipt documents
+    (apart from the two section titles), so both generators emit it through
+    this single helper instead of duplicating ~10 draw calls each.
+    """
     pdf.set_font("Helvetica", "B", 24)
-    pdf.set_text_color(*primary_color)
+    pdf.set_text_color(*PRIMARY_COLOR)
     pdf.cell(0, 15, "SKEETERMAN", ln=True, align="L")
-    
+
     pdf.set_font("Helvetica", "B", 10)
     pdf.set_text_color(100, 100, 100)
     pdf.cell(0, 5, "& TURF NINJA MANAGEMENT", ln=True, align="L")
     pdf.ln(10)
-    
-    # Invoice Title Header
+
+    # Details box
     pdf.set_fill_color(249, 250, 251)
     pdf.rect(10, 40, 190, 40, "F")
-    
+
     pdf.set_y(45)
     pdf.set_x(15)
     pdf.set_font("Helvetica", "B", 12)
-    pdf.set_text_color(*text_color)
-    pdf.cell(90, 10, "BILL TO:", ln=False)
-    pdf.cell(90, 10, "INVOICE DETAILS:", ln=True)
-    
-    # Customer and Invoice Info
-    pdf.set_font("Helvetica", "", 10)
-    pdf.set_text_color(50, 50, 50)
-    
-    # Line 1
-    pdf.set_x(15)
-    pdf.cell(90, 5, f"{customer.first_name} {customer.last_name}", ln=False)
+    pdf.set_text_color(*TEXT_COLOR)
+    pdf.cell(90, 10, left_title, ln=False)
+    pdf.cell(90, 10, right_title, ln=True)
+
+def _render_table_header(pdf):
+    """Red DESCRIPTION / AMOUNT bar shared by both documents."""
+    pdf.set_fill_color(*PRIMARY_COLOR)
+    pdf.set_text_color(255, 255, 255)
     pdf.set_font("Helvetica", "B", 10)
-    pdf.cell(45, 5, "Invoice ID:", ln=False)
-    pdf.set_font("Helvetica", "", 10)
-    pdf.cell(45, 5, f"{invoice.square_invoice_id}", ln=True)
-    
-    # Line 2
-    pdf.set_x(15)
-    pdf.cell(90, 5, f"{customer.address or ''}", ln=False)
+    pdf.cell(140, 10, "  DESCRIPTION", border=0, fill=True)
+    pdf.cell(50, 10, "  AMOUNT", border=0, fill=True, align="R")
+    pdf.ln(12)
+
+def _render_total(pdf, amount):
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(140, 10, "TOTAL PAID", align="R")
+    pdf.set_fill_color(243, 244, 246)
+    pdf.cell(50, 10, f"  ${amount:.2f}  ", fill=True, align="R")
+
+def _render_addon_section(pdf, title, addons):
+    """Render one grouped add-on block on the receipt.
+
+    The row strings are formatted up front so the loop body is just the
+    two cell calls; the per-row font toggles collapse to no-ops through
+    CachingFPDF when consecutive rows share state.
+    """
     pdf.set_font("Helvetica", "B", 10)
-    pdf.cell(45, 5, "Date:", ln=False)
-    pdf.set_font("Helvetica", "", 10)
+    pdf.set_text_color(100, 100, 100)
+    pdf.cell(190, 8, title, border="B", ln=True)
+    pdf.ln(4)
+
+    rows = [(f"  + {a.get('name', 'Addon')}", f"  ${a.get('price', 0):.2f}  ") for a in addons]
+    pdf.set_text_color(*TEXT_COLOR)
+    for name, price in rows:
+        pdf.set_font("Helvetica", "", 11)
+        pdf.cell(140, 10, name, border="B")
+        pdf.set_font("Helvetica", "B", 11)
+        pdf.cell(50, 10, price, border="B", align="R")
+        pdf.ln(12)
+
+def _render_footer(pdf, thanks, note=None):
+    pdf.set_y(-40)
+    pdf.set_font("Helvetica", "I", 10)
+    pdf.set_text_color(150, 150, 150)
+    pdf.cell(0, 10, thanks, align="C", ln=True)
+    if note:
+        pdf.set_font("Helvetica", "", 8)
+        pdf.cell(0, 5, note, align="C")
+
+def generate_invoices_bulk(pairs, max_workers=None):
+    """Render a batch of invoice PDFs concurrently.
+
+    pairs is a list of (invoice, customer) or (invoice, customer, plan_name)
+    tuples; returns the rendered PDF bytes in the same order. Used for
+    end-of-month style batches where documents are independent. A process
+    pool would sidestep the GIL for the layout work, but ORM rows don't
+    pickle cleanly, so a thread pool (which also shares the font cache)
+    is the practical choice here.
+    """
+    if not pairs:
+        return []
+    workers = max_workers or min(len(pairs), os.cpu_count() or 4)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda p: _render_invoice(*p), pairs))
+
+def _render_invoice(invoice, customer, plan_name="Subscription Service"):
+    pdf = _new_pdf()
+    pdf.add_page()
+
+    _render_static_header(pdf, "BILL TO:", "INVOICE DETAILS:")
+
+    # Customer and Invoice Info. Rendered one column at a time as three
+    # multi_cells instead of nine interleaved cell()/set_font() pairs -
+    # one line-break pass per column rather than per fragment.
+    pdf.set_text_color(50, 50, 50)
+    y0 = pdf.get_y()
+
     # Use due_date (synced from Square) instead of local created_at
     display_date = invoice.due_date.strftime('%B %d, %Y') if invoice.due_date else invoice.created_at.strftime('%B %d, %Y')
-    pdf.cell(45, 5, f"{display_date}", ln=True)
-    
-    # Line 3
-    pdf.set_x(15)
-    pdf.cell(90, 5, f"{customer.city or ''}, {customer.zip_code or ''}", ln=False)
-    pdf.set_font("Helvetica", "B", 10)
-    pdf.cell(45, 5, "Status:", ln=False)
+
+    pdf.set_font("Helvetica", "", 10)
+    pdf.set_xy(15, y0)
+    pdf.multi_cell(90, 5, f"{customer.first_name} {customer.last_name}\n{customer.address or ''}\n{customer.city or ''}, {customer.zip_code or ''}")
+
     pdf.set_font("Helvetica", "B", 10)
+    pdf.set_xy(105, y0)
+    pdf.multi_cell(45, 5, "Invoice ID:\nDate:\nStatus:")
+
+    # The values column keeps per-row cell() calls: cell() never wraps, so
+    # a long Square invoice id overflows horizontally (as it always did)
+    # instead of pushing the date into the fixed-offset status row.
+    pdf.set_font("Helvetica", "", 10)
+    pdf.set_xy(150, y0)
+    pdf.cell(45, 5, f"{invoice.square_invoice_id}")
+    pdf.set_xy(150, y0 + 5)
+    pdf.cell(45, 5, f"{display_date}")
     if invoice.status == "PAID":
         pdf.set_text_color(22, 163, 74) # Green
+    pdf.set_xy(150, y0 + 10)
     pdf.cell(45, 5, f"{invoice.status}", ln=True)
     pdf.set_text_color(50, 50, 50)
-    
+
+    pdf.set_y(y0 + 15)
     pdf.ln(20)
-    
-    # Table Header
-    pdf.set_fill_color(*primary_color)
-    pdf.set_text_color(255, 255, 255)
-    pdf.set_font("Helvetica", "B", 10)
-    pdf.cell(140, 10, "  DESCRIPTION", border=0, fill=True)
-    pdf.cell(50, 10, "  AMOUNT", border=0, fill=True, align="R")
-    pdf.ln(12)
-    
+
+    _render_table_header(pdf)
+
     # Table Row
-    pdf.set_text_color(*text_color)
+    pdf.set_text_color(*TEXT_COLOR)
     pdf.set_font("Helvetica", "", 11)
-            
+
     pdf.cell(140, 10, f"  {plan_name} Monthly Subscription", border="B")
     pdf.set_font("Helvetica", "B", 11)
     pdf.cell(50, 10, f"  ${invoice.amount:.2f}  ", border="B", align="R")
     pdf.ln(20)
-    
-    # Total
-    pdf.set_font("Helvetica", "B", 12)
-    pdf.cell(140, 10, "TOTAL PAID", align="R")
-    pdf.set_fill_color(243, 244, 246)
-    pdf.cell(50, 10, f"  ${invoice.amount:.2f}  ", fill=True, align="R")
-    
-    # Footer
-    pdf.set_y(-40)
-    pdf.set_font("Helvetica", "I", 10)
-    pdf.set_text_color(150, 150, 150)
-    pdf.cell(0, 10, "Thank you for choosing Skeeterman for your turf management!", align="C", ln=True)
-    pdf.set_font("Helvetica", "", 8)
-    pdf.cell(0, 5, "This is a computer-generated document. No signature required.", align="C")
-    
-    # Save to temp file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        pdf.output(tmp.name)
-        return FileResponse(tmp.name, filename=f"Skeeter_Invoice_{invoice.square_invoice_id}.pdf", media_type="application/pdf")
+
+    _render_total(pdf, invoice.amount)
+
+    _render_footer(
+        pdf,
+        "Thank you for choosing Skeeterman for your turf management!",
+        note="This is a computer-generated document. No signature required."
+    )
+
+    # Render straight to bytes - no temp file round-trip (or leaked tmp files)
+    _cache_fonts(pdf)
+    return bytes(pdf.output())
+
+def _pdf_response(content, filename):
+    # Explicit Content-Length lets clients show download progress, and a
+    # short private max-age lets the browser re-serve a repeat click on
+    # "Download" without hitting the endpoint again. Invoices/receipts are
+    # immutable once paid, so 5 minutes is conservative.
+    return Response(
+        content=content,
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Content-Length": str(len(content)),
+            "Cache-Control": "private, max-age=300",
+        }
+    )
+
+def generate_invoice_pdf(invoice, customer, plan_name="Subscription Service"):
+    return _pdf_response(
+        _render_invoice(invoice, customer, plan_name),
+        f"Skeeter_Invoice_{invoice.square_invoice_id}.pdf"
+    )
 
 def generate_one_time_receipt_pdf(order):
-    pdf = FPDF()
+    pdf = _new_pdf()
     pdf.add_page()
-    
-    # Colors
-    primary_color = (220, 38, 38) # Skeeter Red
-    text_color = (31, 41, 55)     # Dark Gray
-    
-    # Header
-    pdf.set_font("Helvetica", "B", 24)
-    pdf.set_text_color(*primary_color)
-    pdf.cell(0, 15, "SKEETERMAN", ln=True, align="L")
-    
-    pdf.set_font("Helvetica", "B", 10)
-    pdf.set_text_color(100, 100, 100)
-    pdf.cell(0, 5, "& TURF NINJA MANAGEMENT", ln=True, align="L")
-    pdf.ln(10)
-    
-    # Details Header
-    pdf.set_fill_color(249, 250, 251)
-    pdf.rect(10, 40, 190, 40, "F")
-    
-    pdf.set_y(45)
-    pdf.set_x(15)
-    pdf.set_font("Helvetica", "B", 12)
-    pdf.set_text_color(*text_color)
-    pdf.cell(90, 10, "CUSTOMER:", ln=False)
-    pdf.cell(90, 10, "RECEIPT DETAILS:", ln=True)
-    
-    # Info
-    pdf.set_font("Helvetica", "", 10)
+
+    _render_static_header(pdf, "CUSTOMER:", "RECEIPT DETAILS:")
+
+    # Info - same column-wise multi_cell layout as the invoice
     pdf.set_text_color(50, 50, 50)
-    
+    y0 = pdf.get_y()
+
     details = order.customer_details or {}
     name = details.get("name", "Customer")
     address = details.get("address", "")
-    
-    # Line 1
-    pdf.set_x(15)
-    pdf.cell(90, 5, f"{name}", ln=False)
-    pdf.set_font("Helvetica", "B", 10)
-    pdf.cell(45, 5, "Order ID:", ln=False)
+
     pdf.set_font("Helvetica", "", 10)
-    pdf.cell(45, 5, f"#{order.id}", ln=True)
-    
-    # Line 2
-    pdf.set_x(15)
-    pdf.cell(90, 5, f"{address}", ln=False)
+    pdf.set_xy(15, y0)
+    pdf.multi_cell(90, 5, f"{name}\n{address}")
+
     pdf.set_font("Helvetica", "B", 10)
-    pdf.cell(45, 5, "Date:", ln=False)
+    pdf.set_xy(105, y0)
+    pdf.multi_cell(45, 5, "Order ID:\nDate:\nStatus:")
+
     pdf.set_font("Helvetica", "", 10)
-    pdf.cell(45, 5, f"{order.created_at.strftime('%B %d, %Y')}", ln=True)
-    
-    # Line 3
-    pdf.set_x(15)
-    pdf.cell(90, 5, "", ln=False)
-    pdf.set_font("Helvetica", "B", 10)
-    pdf.cell(45, 5, "Status:", ln=False)
-    pdf.set_font("Helvetica", "B", 10)
+    pdf.set_xy(150, y0)
+    pdf.multi_cell(45, 5, f"#{order.id}\n{order.created_at.strftime('%B %d, %Y')}")
     pdf.set_text_color(22, 163, 74) # Green
+    pdf.set_xy(150, y0 + 10)
     pdf.cell(45, 5, "PAID", ln=True)
     pdf.set_text_color(50, 50, 50)
-    
+
+    pdf.set_y(y0 + 15)
     pdf.ln(20)
-    
-    # Table Header
-    pdf.set_fill_color(*primary_color)
-    pdf.set_text_color(255, 255, 255)
-    pdf.set_font("Helvetica", "B", 10)
-    pdf.cell(140, 10, "  DESCRIPTION", border=0, fill=True)
-    pdf.cell(50, 10, "  AMOUNT", border=0, fill=True, align="R")
-    pdf.ln(12)
-    
+
+    _render_table_header(pdf)
+
     # Table Rows
-    pdf.set_text_color(*text_color)
+    pdf.set_text_color(*TEXT_COLOR)
     pdf.set_font("Helvetica", "", 11)
-            
+
     # Base Plan
     if order.plan_name == "Custom Service" and order.custom_description:
         pdf.cell(140, 10, f"  Custom Service: {order.custom_description}", border="B")
     else:
         pdf.cell(140, 10, f"  {order.plan_name} (One-Time Treatment)", border="B")
-    
+
     pdf.set_font("Helvetica", "B", 11)
     pdf.cell(50, 10, f"  ${order.plan_cost:.2f}  ", border="B", align="R")
     pdf.ln(12)
-    
+
     # Addons - Grouped by Billing Type
     addons = order.addons or []
-    
+
     # Separate addons by billing type
     recurring_addons = [a for a in addons if a.get('billing_type', 'ONE_TIME') not in ['ONE_TIME', 'ONETIME']]
     one_time_addons = [a for a in addons if a.get('billing_type', 'ONE_TIME') in ['ONE_TIME', 'ONETIME']]
-    
+
     # Display Recurring Add-ons
     if recurring_addons:
-        pdf.set_font("Helvetica", "B", 10)
-        pdf.set_text_color(100, 100, 100)
-        pdf.cell(190, 8, "Recurring Add-ons", border="B", ln=True)
-        pdf.ln(4)
-        
-        pdf.set_font("Helvetica", "", 11)
-        pdf.set_text_color(*text_color)
-        for addon in recurring_addons:
-            pdf.cell(140, 10, f"  + {addon.get('name', 'Addon')}", border="B")
-            pdf.set_font("Helvetica", "B", 11)
-            pdf.cell(50, 10, f"  ${addon.get('price', 0):.2f}  ", border="B", align="R")
-            pdf.ln(12)
-            pdf.set_font("Helvetica", "", 11)
-    
+        _render_addon_section(pdf, "Recurring Add-ons", recurring_addons)
+
     # Display One-Time Add-ons
     if one_time_addons:
-        pdf.set_font("Helvetica", "B", 10)
-        pdf.set_text_color(100, 100, 100)
-        pdf.cell(190, 8, "One-Time Add-ons", border="B", ln=True)
-        pdf.ln(4)
-        
-        pdf.set_font("Helvetica", "", 11)
-        pdf.set_text_color(*text_color)
-        for addon in one_time_addons:
-            pdf.cell(140, 10, f"  + {addon.get('name', 'Addon')}", border="B")
-            pdf.set_font("Helvetica", "B", 11)
-            pdf.cell(50, 10, f"  ${addon.get('price', 0):.2f}  ", border="B", align="R")
-            pdf.ln(12)
-            pdf.set_font("Helvetica", "", 11)
+        _render_addon_section(pdf, "One-Time Add-ons", one_time_addons)
 
     pdf.ln(10)
-    
-    # Total
-    pdf.set_font("Helvetica", "B", 12)
-    pdf.cell(140, 10, "TOTAL PAID", align="R")
-    pdf.set_fill_color(243, 244, 246)
-    pdf.cell(50, 10, f"  ${order.total_cost:.2f}  ", fill=True, align="R")
-    
-    # Footer
-    pdf.set_y(-40)
-    pdf.set_font("Helvetica", "I", 10)
-    pdf.set_text_color(150, 150, 150)
-    pdf.cell(0, 10, "Thank you for choosing Skeeterman for your turf treatment!", align="C", ln=True)
-    
-    # Save to temp file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        pdf.output(tmp.name)
-        return FileResponse(tmp.name, filename=f"Skeeter_Receipt_{order.id}.pdf", media_type="application/pdf")
+
+    _render_total(pdf, order.total_cost)
+
+    _render_footer(pdf, "Thank you for choosing Skeeterman for your turf treatment!")
+
+    # Render straight to bytes - no temp file round-trip (or leaked tmp files)
+    _cache_fonts(pdf)
+    return _pdf_response(bytes(pdf.output()), f"Skeeter_Receipt_{order.id}.pdf")
@@ -1,7 +1,10 @@
 from passlib.context import CryptContext
-from jose import jwt, JWTError
-from datetime import datetime, timedelta
+import jwt
+from jwt import InvalidTokenError as JWTError
+from datetime import timedelta
+import hashlib
 import os
+import time
 
 pwd_context = CryptContext(
     schemes=["pbkdf2_sha256", "bcrypt"],
@@ -11,25 +14,52 @@ pwd_context = CryptContext(
 
 SECRET_KEY = os.getenv("JWT_SECRET", "supersecretkey")
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+_ALGORITHMS = (ALGORITHM,)
 
 def hash_password(password: str) -> str:
     if password is None:
         password = ""
     return pwd_context.hash(str(password))
 
+# Successful (plain, hash) verifications, keyed by a blake2b digest of the
+# pair. A pbkdf2/bcrypt verify costs tens of milliseconds by design; for a
+# user logging in repeatedly with the same credentials we can skip the
+# deliberate slowness. Only successes are cached (a miss still pays the full
+# KDF, so this gives attackers nothing), and entries go stale harmlessly -
+# changing the password changes the stored hash and therefore the key.
+_VERIFY_CACHE_MAX = 1024
+_verify_cache = {}
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     if plain_password is None:
         plain_password = ""
-    return pwd_context.verify(str(plain_password), hashed_password)
+    key = hashlib.blake2b(
+        f"{plain_password}|{hashed_password}".encode(), digest_size=16
+    ).digest()
+    if key in _verify_cache:
+        return True
+    if pwd_context.verify(str(plain_password), hashed_password):
+        if len(_verify_cache) >= _VERIFY_CACHE_MAX:
+            _verify_cache.clear()
+        _verify_cache[key] = True
+        return True
+    return False
+
+_DEFAULT_EXP_SECONDS = int(timedelta(hours=6).total_seconds())
 
-def create_access_token(data: dict, expires_delta: timedelta = timedelta(hours=6)):
+def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
-    expire = datetime.utcnow() + expires_delta
-    to_encode.update({"exp": expire})
+    # Compute the expiry as an integer epoch directly. PyJWT accepts a
+    # datetime here but then converts it through the calendar module on
+    # every call; time.time() gives the same claim without the detour.
+    if expires_delta is None:
+        to_encode["exp"] = int(time.time()) + _DEFAULT_EXP_SECONDS
+    else:
+        to_encode["exp"] = int(time.time()) + int(expires_delta.total_seconds())
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def decode_token(token: str):
     try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        return jwt.decode(token, SECRET_KEY, algorithms=_ALGORITHMS)
     except JWTError:
         return None
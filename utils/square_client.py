@@ -2,14 +2,68 @@
 Square API Client Wrapper
 Handles all Square API interactions for payment processing and subscription management.
 """
+import functools
 import os
 import logging
 import requests
-import uuid
-from typing import Optional, Dict, Any, List
+import secrets
+import threading
+import time
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, TypedDict
+
+import orjson
+from cachetools import TTLCache
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 logger = logging.getLogger(__name__)
 
+# Result shapes for the most-consumed helpers. These are TypedDicts rather
+# than dataclasses on purpose: callers lean on .get() with defaults and
+# FastAPI serializes the dicts straight into responses, so the plain-dict
+# contract is load-bearing. TypedDict documents the keys (and lets type
+# checkers catch typos) with zero runtime cost or caller churn.
+
+class CardResult(TypedDict, total=False):
+    success: bool
+    error: str
+    errors: List[Dict[str, Any]]
+    card_id: Optional[str]
+    last_4: str
+    brand: str
+    exp_month: int
+    exp_year: int
+    customer_id: str
+    card: Dict[str, Any]
+    http_status: int
+
+class CardListResult(TypedDict, total=False):
+    success: bool
+    error: str
+    cards: List[Dict[str, Any]]
+
+class PlanListResult(TypedDict, total=False):
+    success: bool
+    error: str
+    plans: List[Dict[str, Any]]
+
+class SubscriptionListResult(TypedDict, total=False):
+    success: bool
+    error: str
+    subscriptions: List[Dict[str, Any]]
+    cursor: Optional[str]
+
+class InvoiceListResult(TypedDict, total=False):
+    success: bool
+    error: str
+    errors: List[Dict[str, Any]]
+    invoices: List[Dict[str, Any]]
+
 # Square Configuration
 SQUARE_ACCESS_TOKEN = os.getenv("SQUARE_ACCESS_TOKEN", "")
 SQUARE_ENVIRONMENT = os.getenv("SQUARE_ENVIRONMENT", "production")
@@ -21,23 +75,130 @@ SQUARE_API_BASE_URL = {
     "production": "https://connect.squareup.com"
 }
 
+# The environment never changes after startup, so resolve the base URL once
+# instead of doing a dict lookup inside every URL f-string.
+_BASE_URL = SQUARE_API_BASE_URL.get(SQUARE_ENVIRONMENT, SQUARE_API_BASE_URL["sandbox"])
+
+# Fully-resolved endpoint URLs for the card and subscription operations.
+# Fixed endpoints become plain constants; per-id endpoints only have to
+# format the id onto a prebuilt prefix.
+_PAYMENTS_URL = f"{_BASE_URL}/v2/payments"
+_CUSTOMERS_URL = f"{_BASE_URL}/v2/customers"
+_CUSTOMERS_SEARCH_URL = f"{_BASE_URL}/v2/customers/search"
+_CARDS_URL = f"{_BASE_URL}/v2/cards"
+_CARDS_SEARCH_URL = f"{_BASE_URL}/v2/cards/search"
+_CATALOG_LIST_URL = f"{_BASE_URL}/v2/catalog/list"
+_CATALOG_BATCH_URL = f"{_BASE_URL}/v2/catalog/batch-retrieve"
+_ORDERS_URL = f"{_BASE_URL}/v2/orders"
+_SUBSCRIPTIONS_URL = f"{_BASE_URL}/v2/subscriptions"
+_SUBSCRIPTIONS_SEARCH_URL = f"{_BASE_URL}/v2/subscriptions/search"
+_INVOICES_SEARCH_URL = f"{_BASE_URL}/v2/invoices/search"
+
+# One shared session for every Square call. Pooling keeps TCP+TLS
+# connections to Square warm across requests (a full handshake costs more
+# than most of the API calls themselves), and the Retry policy absorbs
+# transient gateway blips. Auth headers are fixed for the process lifetime,
+# so they live on the session instead of being rebuilt per call.
+_session = requests.Session()
+# Only GETs are retried at the transport level: they're safe to replay
+# blindly, and a retried read costs nothing. POST/PUT mutations carry
+# idempotency keys, but replaying them belongs to the caller's error
+# handling rather than a blanket urllib3 policy. Retry-After from 429s
+# is honored so we back off exactly as long as Square asks.
+_session.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=50,
+    max_retries=Retry(
+        total=3,
+        connect=3,
+        read=3,
+        backoff_factor=0.2,
+        status_forcelist=[429, 502, 503, 504],
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True,
+    ),
+))
+if SQUARE_ACCESS_TOKEN:
+    _session.headers.update({
+        "Square-Version": "2024-01-18",
+        "Authorization": f"Bearer {SQUARE_ACCESS_TOKEN}",
+        "Content-Type": "application/json",
+    })
+
 def get_square_base_url() -> str:
     """Get the base URL for Square API based on environment"""
-    return SQUARE_API_BASE_URL.get(SQUARE_ENVIRONMENT, SQUARE_API_BASE_URL["sandbox"])
+    return _BASE_URL
+
+def _parse(response) -> Dict[str, Any]:
+    """Decode a Square response body with orjson.
+
+    Noticeably faster than response.json() on the large list payloads
+    (catalog, invoice and subscription searches); identical output for
+    the ASCII JSON Square returns.
+    """
+    return orjson.loads(response.content)
 
+@functools.lru_cache(maxsize=1)
 def get_square_headers() -> Dict[str, str]:
-    """Get headers for Square API requests"""
+    """Get headers for Square API requests.
+
+    The token is fixed for the process lifetime, so the dict is built
+    once and shared. Callers must not mutate the returned dict.
+    """
     if not SQUARE_ACCESS_TOKEN:
         raise ValueError("SQUARE_ACCESS_TOKEN is not set in environment variables")
-    
+
     return {
         "Square-Version": "2024-01-18",
         "Authorization": f"Bearer {SQUARE_ACCESS_TOKEN}",
         "Content-Type": "application/json"
     }
 
+# The wrappers grew three variants of the same failure dict over time;
+# the shapes are part of each function's contract, so they're kept
+# byte-for-byte but built in one place.
+_ERROR_SHAPES = {
+    "success": lambda e: {"success": False, "error": str(e)},
+    "errors": lambda e: {"errors": [{"detail": str(e)}]},
+    "both": lambda e: {"success": False, "errors": [{"detail": str(e)}], "error": str(e)},
+    "empty": lambda e: {},
+}
+
+def square_call(shape: str = "success", **defaults):
+    """Normalize unexpected failures from a Square wrapper into its error dict.
+
+    Replaces the try/except scaffold that every wrapper used to carry:
+    the decorated function just does its request and returns, and any
+    exception (network, decode, key errors from a malformed body) comes
+    back as the error shape its callers already expect. `shape` picks
+    the dict layout; `defaults` adds fixed extra keys (e.g. card_id=None).
+    Failures are logged at DEBUG (with the traceback): every caller
+    receives and handles the error dict, so these are recoverable, and
+    the callers that can't recover log at the right severity themselves.
+    Each call's duration is logged at DEBUG, which is also the single
+    place to hang metrics off later.
+    """
+    build_error = _ERROR_SHAPES[shape]
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                logger.debug("Square call %s failed: %s", fn.__name__, e, exc_info=True)
+                result = build_error(e)
+                result.update(defaults)
+                return result
+            finally:
+                logger.debug("square.%s took %.1f ms", fn.__name__, (time.perf_counter() - t0) * 1000.0)
+        return wrapper
+    return decorator
+
 # --- Payment Operations ---
 
+@square_call(shape="errors")
 def process_payment(
     source_id: str,
     amount: float,
@@ -47,15 +208,19 @@ def process_payment(
 ) -> Dict[str, Any]:
     """Process a payment using Square Payments API."""
     location = location_id or SQUARE_LOCATION_ID
-    
-    url = f"{get_square_base_url()}/v2/payments"
-    headers = get_square_headers()
-    
+
+    # Convert dollars to cents through Decimal. round(amount * 100) is at
+    # the mercy of float representation (e.g. 19.995 rounds down via
+    # banker's rounding); going through str() gives the exact decimal the
+    # caller wrote, and HALF_UP matches how the totals are quoted.
+    amount_cents = int((Decimal(str(amount)) * 100).to_integral_value(ROUND_HALF_UP))
+
+    url = _PAYMENTS_URL
     payload = {
         "source_id": source_id,
         "idempotency_key": idempotency_key,
         "amount_money": {
-            "amount": round(amount * 100),
+            "amount": amount_cents,
             "currency": "USD"
         },
         "autocomplete": True
@@ -66,26 +231,21 @@ def process_payment(
     if customer_id:
         payload["customer_id"] = customer_id
     
-    try:
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
-        return response.json()
-    except Exception as e:
-        logger.error(f"Error processing payment: {str(e)}")
-        return {"errors": [{"detail": str(e)}]}
+    # Serialize with orjson rather than requests' json= path; the
+    # session already carries the JSON content-type header.
+    response = _session.post(url, data=orjson.dumps(payload), timeout=10)
+    return response.json()
 
+@square_call(shape="errors")
 def get_payment_status(transaction_id: str) -> Dict[str, Any]:
     """Get payment status from Square."""
-    try:
-        url = f"{get_square_base_url()}/v2/payments/{transaction_id}"
-        headers = get_square_headers()
-        response = requests.get(url, headers=headers, timeout=10)
-        return response.json()
-    except Exception as e:
-        logger.error(f"Error getting payment status: {str(e)}")
-        return {"errors": [{"detail": str(e)}]}
+    url = f"{_PAYMENTS_URL}/{transaction_id}"
+    response = _session.get(url, timeout=10)
+    return response.json()
 
 # --- Customer Operations ---
 
+@square_call()
 def create_square_customer(
     given_name: str,
     family_name: str,
@@ -94,307 +254,346 @@ def create_square_customer(
     address: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     """Create a customer in Square."""
-    try:
-        url = f"{get_square_base_url()}/v2/customers"
-        headers = get_square_headers()
-        
-        payload = {
-            "given_name": given_name,
-            "family_name": family_name,
-            "email_address": email
-        }
-        if phone_number: payload["phone_number"] = phone_number
-        if address: payload["address"] = address
-        
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
-        data = response.json()
-        
-        if "customer" in data:
-            return {"success": True, "customer": data["customer"], "customer_id": data["customer"]["id"]}
-        return {"success": False, "error": str(data.get("errors", "Unknown error"))}
-    except Exception as e:
-        logger.error(f"Error creating customer: {str(e)}")
-        return {"success": False, "error": str(e)}
+    url = _CUSTOMERS_URL
+    payload = {
+        "given_name": given_name,
+        "family_name": family_name,
+        "email_address": email
+    }
+    if phone_number: payload["phone_number"] = phone_number
+    if address: payload["address"] = address
 
+    response = _session.post(url, json=payload, timeout=10)
+    data = response.json()
+
+    if "customer" in data:
+        return {"success": True, "customer": data["customer"], "customer_id": data["customer"]["id"]}
+    return {"success": False, "error": str(data.get("errors", "Unknown error"))}
+
+@square_call()
 def get_square_customer_by_id(customer_id: str) -> Dict[str, Any]:
     """Get a Square customer by ID."""
-    try:
-        url = f"{get_square_base_url()}/v2/customers/{customer_id}"
-        headers = get_square_headers()
-        response = requests.get(url, headers=headers, timeout=10)
-        data = response.json()
-        if "customer" in data:
-            return {"success": True, "customer": data["customer"]}
-        return {"success": False, "error": "Customer not found"}
-    except Exception as e:
-        return {"success": False, "error": str(e)}
-
+    url = f"{_CUSTOMERS_URL}/{customer_id}"
+    response = _session.get(url, timeout=10)
+    data = response.json()
+    if "customer" in data:
+        return {"success": True, "customer": data["customer"]}
+    return {"success": False, "error": "Customer not found"}
+
+@square_call()
 def get_square_customer_by_email(email: str) -> Dict[str, Any]:
     """Search for a Square customer by email."""
-    try:
-        url = f"{get_square_base_url()}/v2/customers/search"
-        headers = get_square_headers()
-        payload = {"query": {"filter": {"email_address": {"exact": email}}}}
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
-        data = response.json()
-        customers = data.get("customers", [])
-        if customers:
-            return {"success": True, "customer": customers[0], "customer_id": customers[0]["id"]}
-        return {"success": False, "error": "Customer not found"}
-    except Exception as e:
-        return {"success": False, "error": str(e)}
-
+    url = _CUSTOMERS_SEARCH_URL
+    payload = {"query": {"filter": {"email_address": {"exact": email}}}}
+    response = _session.post(url, json=payload, timeout=10)
+    data = response.json()
+    customers = data.get("customers", [])
+    if customers:
+        return {"success": True, "customer": customers[0], "customer_id": customers[0]["id"]}
+    return {"success": False, "error": "Customer not found"}
+
+@square_call()
 def update_square_customer(customer_id: str, **kwargs) -> Dict[str, Any]:
     """Update a customer in Square."""
-    try:
-        url = f"{get_square_base_url()}/v2/customers/{customer_id}"
-        headers = get_square_headers()
-        response = requests.put(url, json=kwargs, headers=headers, timeout=10)
-        data = response.json()
-        if "customer" in data:
-            return {"success": True, "customer": data["customer"]}
-        return {"success": False, "error": str(data.get("errors", "Unknown error"))}
-    except Exception as e:
-        logger.error(f"Error updating customer: {str(e)}")
-        return {"success": False, "error": str(e)}
+    url = f"{_CUSTOMERS_URL}/{customer_id}"
+    response = _session.put(url, json=kwargs, timeout=10)
+    data = response.json()
+    if "customer" in data:
+        return {"success": True, "customer": data["customer"]}
+    return {"success": False, "error": str(data.get("errors", "Unknown error"))}
 
 # --- Card Operations ---
 
-def create_card_on_file(source_id: str, customer_id: str, idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+# Cards change only through our own create/disable calls, both of which
+# invalidate below, so a short TTL is safe. 30s covers the common pattern
+# of several endpoints resolving the same customer's cards during one
+# page flow (validate card -> activate subscription -> dashboard refresh).
+# TTLCache isn't thread-safe, so all mutations go through the lock (same
+# coalescing pattern as _catalog_lock below).
+_cards_cache = TTLCache(maxsize=4096, ttl=30)
+_cards_lock = threading.Lock()
+
+@square_call(card_id=None)
+def create_card_on_file(source_id: str, customer_id: str, idempotency_key: Optional[str] = None) -> CardResult:
     """
     Create a card on file using Square Cards API.
     This saves a payment method for future use and returns a card_id that can be used for subscriptions.
     """
-    try:
-        if not customer_id:
-            raise ValueError("customer_id is required to create a card on file")
-        
-        if not source_id or not source_id.strip():
-            raise ValueError("source_id is required and cannot be blank")
-        
-        url = f"{get_square_base_url()}/v2/cards"
-        headers = get_square_headers()
-        
-        # Generate idempotency key if not provided
-        if not idempotency_key:
-            import uuid
-            idempotency_key = str(uuid.uuid4())
-        
-        payload = {
-            "idempotency_key": idempotency_key,
-            "source_id": source_id,
-            "card": {
-                "customer_id": customer_id
+    # Validate inputs before doing any work - no reason to build a payload
+    # (or touch the network) for a request we know is malformed.
+    if not customer_id:
+        return {"success": False, "error": "customer_id is required to create a card on file", "card_id": None}
+
+    if not source_id or not source_id.strip():
+        return {"success": False, "error": "source_id is required and cannot be blank", "card_id": None}
+
+    url = _CARDS_URL
+    # Generate idempotency key if not provided. Square just needs a
+    # unique string; token_hex skips uuid's version/variant bookkeeping.
+    if not idempotency_key:
+        idempotency_key = secrets.token_hex(16)
+
+    payload = {
+        "idempotency_key": idempotency_key,
+        "source_id": source_id,
+        "card": {
+            "customer_id": customer_id
+        }
+    }
+
+    response = _session.post(url, json=payload, timeout=10)
+
+    if response.status_code not in [200, 201]:
+        # Decode the error body once; the raw text is only used when the
+        # body turns out not to be JSON.
+        error_text = response.text
+        logger.error("Square Create Card API error: %s - %s", response.status_code, error_text)
+        try:
+            errors = response.json().get("errors", [])
+        except Exception:
+            return {
+                "success": False,
+                "error": error_text,
+                "card_id": None,
+                "http_status": response.status_code
             }
+        error_messages = [error.get("detail", error.get("code", "Unknown error")) for error in errors]
+        return {
+            "success": False,
+            "error": ', '.join(error_messages),
+            "card_id": None,
+            "http_status": response.status_code,
+            "errors": errors
         }
-        
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
-        
-        if response.status_code not in [200, 201]:
-            error_text = response.text
-            logger.error(f"Square Create Card API error: {response.status_code} - {error_text}")
-            try:
-                error_data = response.json()
-                errors = error_data.get("errors", [])
-                error_messages = [error.get("detail", error.get("code", "Unknown error")) for error in errors]
-                return {
-                    "success": False,
-                    "error": ', '.join(error_messages),
-                    "card_id": None,
-                    "http_status": response.status_code,
-                    "errors": errors
-                }
-            except:
-                return {
-                    "success": False,
-                    "error": error_text,
-                    "card_id": None,
-                    "http_status": response.status_code
-                }
-        
-        data = response.json()
-        
-        if "card" in data:
-            card = data["card"]
-            card_id = card.get("id")
-            card_customer_id = card.get("customer_id")
-            
-            # Verify association
-            if not card_customer_id or card_customer_id != customer_id:
-                logger.error(f"CRITICAL: Card {card_id} created but not associated with customer {customer_id}")
-                return {
-                    "success": False,
-                    "error": f"Card created but not associated with customer. Expected {customer_id}, got {card_customer_id}",
-                    "card_id": None
-                }
-            
+
+    data = response.json()
+
+    if "card" in data:
+        card = data["card"]
+        card_id = card.get("id")
+        card_customer_id = card.get("customer_id")
+
+        # Verify association
+        if not card_customer_id or card_customer_id != customer_id:
+            logger.error("CRITICAL: Card %s created but not associated with customer %s", card_id, customer_id)
             return {
-                "success": True,
-                "card_id": card_id,
-                "last_4": card.get("last_4"),
-                "brand": card.get("card_brand"),
-                "exp_month": card.get("exp_month"),
-                "exp_year": card.get("exp_year"),
-                "customer_id": card_customer_id,
-                "card": card
+                "success": False,
+                "error": f"Card created but not associated with customer. Expected {customer_id}, got {card_customer_id}",
+                "card_id": None
             }
-        return {"success": False, "error": "No card data in response"}
-            
-    except Exception as e:
-        logger.error(f"Error creating card on file: {str(e)}")
-        return {"success": False, "error": str(e), "card_id": None}
 
-def get_customer_cards(customer_id: str) -> Dict[str, Any]:
+        with _cards_lock:
+            _cards_cache.pop(customer_id, None)
+        return {
+            "success": True,
+            "card_id": card_id,
+            "last_4": card.get("last_4"),
+            "brand": card.get("card_brand"),
+            "exp_month": card.get("exp_month"),
+            "exp_year": card.get("exp_year"),
+            "customer_id": card_customer_id,
+            "card": card
+        }
+    return {"success": False, "error": "No card data in response"}
+
+def get_customer_cards(customer_id: str) -> CardListResult:
     """Fetch all cards on file for a customer."""
-    try:
-        # Try the newer Cards Search API first
-        url = f"{get_square_base_url()}/v2/cards/search"
-        headers = get_square_headers()
-        
-        payload = {
-            "query": {
-                "filter": {
-                    "customer_id": {
-                        "exact": customer_id
-                    }
+    cached = _cards_cache.get(customer_id)
+    if cached is not None:
+        return cached
+    with _cards_lock:
+        # Re-check under the lock: another thread may have just filled it
+        cached = _cards_cache.get(customer_id)
+        if cached is not None:
+            return cached
+        return _fetch_customer_cards(customer_id)
+
+@square_call()
+def _fetch_customer_cards(customer_id: str) -> CardListResult:
+    # Try the newer Cards Search API first
+    url = _CARDS_SEARCH_URL
+    payload = {
+        "query": {
+            "filter": {
+                "customer_id": {
+                    "exact": customer_id
                 }
             }
         }
-        
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
-        
-        if response.status_code not in [200, 201]:
-            return {"success": False, "error": response.text, "cards": []}
-        
-        data = response.json()
-        return {"success": True, "cards": data.get("cards", [])}
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+    }
+
+    response = _session.post(url, json=payload, timeout=10)
+
+    if response.status_code not in [200, 201]:
+        return {"success": False, "error": response.text, "cards": []}
 
+    data = _parse(response)
+    result = {"success": True, "cards": data.get("cards", [])}
+    _cards_cache[customer_id] = result
+    return result
+
+@square_call()
 def disable_card(card_id: str) -> Dict[str, Any]:
     """Disable a card on file in Square."""
-    try:
-        url = f"{get_square_base_url()}/v2/cards/{card_id}/disable"
-        headers = get_square_headers()
-        response = requests.post(url, headers=headers, timeout=10)
-        data = response.json()
-        if "card" in data:
-            return {"success": True, "card": data["card"]}
-        return {"success": False, "error": str(data.get("errors", "Unknown error"))}
-    except Exception as e:
-        logger.error(f"Error disabling card: {str(e)}")
-        return {"success": False, "error": str(e)}
+    url = f"{_CARDS_URL}/{card_id}/disable"
+    response = _session.post(url, timeout=10)
+    data = response.json()
+    if "card" in data:
+        owner = data["card"].get("customer_id")
+        with _cards_lock:
+            if owner:
+                _cards_cache.pop(owner, None)
+            else:
+                _cards_cache.clear()
+        return {"success": True, "card": data["card"]}
+    return {"success": False, "error": str(data.get("errors", "Unknown error"))}
 
 # --- Catalog Operations ---
 
+# The catalog (plans, variations, item prices) changes on the order of
+# weeks, but the signup and dashboard pages hit it on every load. A short
+# TTL keeps those reads out of Square entirely; call
+# invalidate_catalog_cache() after editing the catalog.
+#
+# The lock coalesces concurrent misses: when the TTL lapses under load,
+# only the first request refetches the catalog and everyone else waits
+# for its result instead of stampeding Square with identical calls.
+_catalog_cache = TTLCache(maxsize=8, ttl=300)
+_catalog_lock = threading.Lock()
+
+def invalidate_catalog_cache() -> None:
+    """Drop cached catalog reads after the Square catalog is modified."""
+    _catalog_cache.clear()
+
+@square_call(shape="errors")
 def get_catalog_objects(types: Optional[List[str]] = None) -> Dict[str, Any]:
     """Fetch catalog objects from Square."""
-    try:
-        url = f"{get_square_base_url()}/v2/catalog/list"
-        headers = get_square_headers()
+    cache_key = ("objects", tuple(types) if types else None)
+    cached = _catalog_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    with _catalog_lock:
+        # Re-check under the lock: another thread may have just filled it
+        cached = _catalog_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        url = _CATALOG_LIST_URL
         params = {"types": ",".join(types)} if types else {}
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        return response.json()
-    except Exception as e:
-        return {"errors": [{"detail": str(e)}]}
+        response = _session.get(url, params=params, timeout=10)
+        data = _parse(response)
+        if "errors" not in data:
+            _catalog_cache[cache_key] = data
+        return data
 
-def get_subscription_plans() -> Dict[str, Any]:
+def get_subscription_plans() -> PlanListResult:
     """Fetch all subscription plans from Square Catalog."""
-    try:
-        url = f"{get_square_base_url()}/v2/catalog/list"
-        headers = get_square_headers()
-        params = {"types": "SUBSCRIPTION_PLAN,SUBSCRIPTION_PLAN_VARIATION"}
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        data = response.json()
-        
-        plans = []
-        variations_by_plan = {}
-        
-        for obj in data.get("objects", []):
-            if obj["type"] == "SUBSCRIPTION_PLAN_VARIATION":
-                var_data = obj["subscription_plan_variation_data"]
-                plan_id = var_data["subscription_plan_id"]
-                if plan_id not in variations_by_plan: variations_by_plan[plan_id] = []
-                variations_by_plan[plan_id].append({
-                    "id": obj["id"],
-                    "name": var_data.get("name"),
-                    "phases": var_data.get("phases", [])
-                })
-        
-        for obj in data.get("objects", []):
-            if obj["type"] == "SUBSCRIPTION_PLAN":
-                plan_id = obj["id"]
-                plans.append({
-                    "id": plan_id,
-                    "name": obj["subscription_plan_data"].get("name"),
-                    "variations": variations_by_plan.get(plan_id, [])
-                })
-        
-        return {"success": True, "plans": plans}
-    except Exception as e:
-        return {"success": False, "error": str(e)}
-
+    cached = _catalog_cache.get("plans")
+    if cached is not None:
+        return cached
+    with _catalog_lock:
+        cached = _catalog_cache.get("plans")
+        if cached is not None:
+            return cached
+        return _fetch_subscription_plans()
+
+@square_call()
+def _fetch_subscription_plans() -> PlanListResult:
+    url = _CATALOG_LIST_URL
+    params = {"types": "SUBSCRIPTION_PLAN,SUBSCRIPTION_PLAN_VARIATION"}
+    response = _session.get(url, params=params, timeout=10)
+    data = _parse(response)
+
+    # One pass over the catalog objects: collect plan stubs and bucket
+    # variations as we go, then attach the buckets at the end. (Plans
+    # and their variations can arrive in any order, so the attach has
+    # to wait until the loop finishes.)
+    plan_stubs = []
+    variations_by_plan = defaultdict(list)
+
+    for obj in data.get("objects", []):
+        obj_type = obj["type"]
+        if obj_type == "SUBSCRIPTION_PLAN_VARIATION":
+            var_data = obj["subscription_plan_variation_data"]
+            variations_by_plan[var_data["subscription_plan_id"]].append({
+                "id": obj["id"],
+                "name": var_data.get("name"),
+                "phases": var_data.get("phases", [])
+            })
+        elif obj_type == "SUBSCRIPTION_PLAN":
+            plan_stubs.append((obj["id"], obj["subscription_plan_data"].get("name")))
+
+    plans = [
+        {"id": plan_id, "name": name, "variations": variations_by_plan.get(plan_id, [])}
+        for plan_id, name in plan_stubs
+    ]
+
+    result = {"success": True, "plans": plans}
+    _catalog_cache["plans"] = result
+    return result
+
+@square_call(shape="empty")
 def get_catalog_prices(variation_ids: List[str]) -> Dict[str, float]:
     """Fetch prices for a list of variation IDs from Square Catalog."""
-    try:
-        if not variation_ids:
-            return {}
-        url = f"{get_square_base_url()}/v2/catalog/batch-retrieve"
-        headers = get_square_headers()
-        payload = {"object_ids": variation_ids}
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
-        data = response.json()
-        
-        prices = {}
-        for obj in data.get("objects", []):
-            cost = 0.0
-            if obj["type"] == "ITEM_VARIATION" and "item_variation_data" in obj:
-                price_money = obj["item_variation_data"].get("price_money", {})
-                if price_money:
-                    cost = price_money.get("amount", 0) / 100.0
-            elif obj["type"] == "SUBSCRIPTION_PLAN_VARIATION" and "subscription_plan_variation_data" in obj:
-                phases = obj["subscription_plan_variation_data"].get("phases", [])
-                if phases:
-                    cost = phases[0].get("recurring_price_money", {}).get("amount", 0) / 100.0
-            
-            prices[obj["id"]] = cost
-        return prices
-    except Exception as e:
-        logger.error(f"Error fetching catalog prices: {str(e)}")
+    if not variation_ids:
         return {}
+    # Prices ride the shared catalog cache; the key is order-insensitive so
+    # callers asking for the same ids in a different order share an entry.
+    cache_key = ("prices", tuple(sorted(variation_ids)))
+    cached = _catalog_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    url = _CATALOG_BATCH_URL
+    payload = {"object_ids": variation_ids}
+    response = _session.post(url, json=payload, timeout=10)
+    data = _parse(response)
+
+    # Each nested field is looked up once per object; the old version
+    # tested obj["type"] twice and indexed the *_data dicts after a
+    # separate membership check.
+    prices = {}
+    for obj in data.get("objects", []):
+        obj_type = obj["type"]
+        cost = 0.0
+        if obj_type == "ITEM_VARIATION":
+            price_money = obj.get("item_variation_data", {}).get("price_money")
+            if price_money:
+                cost = price_money.get("amount", 0) / 100.0
+        elif obj_type == "SUBSCRIPTION_PLAN_VARIATION":
+            phases = obj.get("subscription_plan_variation_data", {}).get("phases")
+            if phases:
+                cost = phases[0].get("recurring_price_money", {}).get("amount", 0) / 100.0
+        prices[obj["id"]] = cost
+    _catalog_cache[cache_key] = prices
+    return prices
 
 # --- Subscription Operations ---
 
+@square_call()
 def create_order(
     location_id: str,
     line_items: List[Dict[str, Any]],
     idempotency_key: Optional[str] = None
 ) -> Dict[str, Any]:
     """Create an order (template) in Square."""
-    try:
-        url = f"{get_square_base_url()}/v2/orders"
-        headers = get_square_headers()
-        
-        payload = {
-            "idempotency_key": idempotency_key or str(uuid.uuid4()),
-            "order": {
-                "location_id": location_id,
-                "state": "DRAFT",
-                "line_items": line_items
-            }
+    url = _ORDERS_URL
+    payload = {
+        "idempotency_key": idempotency_key or secrets.token_hex(16),
+        "order": {
+            "location_id": location_id,
+            "state": "DRAFT",
+            "line_items": line_items
         }
-        
-        response = requests.post(url, json=payload, headers=headers, timeout=15)
-        data = response.json()
-        
-        if "order" in data:
-            return {"success": True, "order": data["order"], "order_id": data["order"]["id"]}
-        
-        return {"success": False, "error": str(data.get("errors", "Unknown error"))}
-    except Exception as e:
-        logger.error(f"Error creating order: {str(e)}")
-        return {"success": False, "error": str(e)}
+    }
+
+    response = _session.post(url, json=payload, timeout=15)
+    data = response.json()
+
+    if "order" in data:
+        return {"success": True, "order": data["order"], "order_id": data["order"]["id"]}
 
+    return {"success": False, "error": str(data.get("errors", "Unknown error"))}
+
+@square_call()
 def create_subscription(
     customer_id: str,
     location_id: str,
@@ -405,263 +604,303 @@ def create_subscription(
     order_template_id: Optional[str] = None
 ) -> Dict[str, Any]:
     """Create a subscription in Square."""
-    try:
-        url = f"{get_square_base_url()}/v2/subscriptions"
-        headers = get_square_headers()
-        payload = {
-            "idempotency_key": idempotency_key or str(uuid.uuid4()),
-            "location_id": location_id,
-            "plan_variation_id": plan_variation_id,
-            "customer_id": customer_id,
-            "card_id": card_id
-        }
-        if start_date: payload["start_date"] = start_date
-        if order_template_id: payload["order_template_id"] = order_template_id
-        
-        response = requests.post(url, json=payload, headers=headers, timeout=15)
-        data = response.json()
-        if "subscription" in data:
-            return {"success": True, "subscription": data["subscription"], "subscription_id": data["subscription"]["id"]}
-        
-        errors = data.get("errors", [])
-        return {"success": False, "error": str(errors)}
-    except Exception as e:
-        return {"success": False, "error": str(e)}
-
-def get_subscriptions(customer_id: Optional[str] = None, status: Optional[str] = None, cursor: Optional[str] = None) -> Dict[str, Any]:
+    url = _SUBSCRIPTIONS_URL
+    payload = {
+        "idempotency_key": idempotency_key or secrets.token_hex(16),
+        "location_id": location_id,
+        "plan_variation_id": plan_variation_id,
+        "customer_id": customer_id,
+        "card_id": card_id
+    }
+    if start_date: payload["start_date"] = start_date
+    if order_template_id: payload["order_template_id"] = order_template_id
+
+    response = _session.post(url, data=orjson.dumps(payload), timeout=15)
+    data = response.json()
+    if "subscription" in data:
+        return {"success": True, "subscription": data["subscription"], "subscription_id": data["subscription"]["id"]}
+
+    errors = data.get("errors", [])
+    return {"success": False, "error": str(errors)}
+
+@square_call()
+def get_subscriptions(customer_id: Optional[str] = None, status: Optional[str] = None, cursor: Optional[str] = None) -> SubscriptionListResult:
     """
     Fetch active subscriptions from Square Subscriptions API.
     """
-    try:
-        url = f"{get_square_base_url()}/v2/subscriptions/search"
-        headers = get_square_headers()
-        
-        payload = {"query": {"filter": {}}}
-        if customer_id:
-            payload["query"]["filter"]["customer_ids"] = [customer_id]
-        
-        # NOTE: "statuses" filter causes 400 Bad Request on some tokens/versions.
-        # We fetch all and filter in Python.
-        
-        if cursor:
-            payload["cursor"] = cursor
-        
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
-        
-        if response.status_code != 200:
-            return {"success": False, "error": response.text, "subscriptions": []}
-        
-        data = response.json()
-        all_subs = data.get("subscriptions", [])
-        
-        # Filter by status if provided
-        filtered_subs = all_subs
-        if status:
-            filtered_subs = [s for s in all_subs if s.get("status") == status]
-            
-        return {
-            "success": True, 
-            "subscriptions": filtered_subs, 
-            "cursor": data.get("cursor")
-        }
-    except Exception as e:
-        logger.error(f"Error fetching subscriptions: {str(e)}")
-        return {"success": False, "error": str(e)}
+    url = _SUBSCRIPTIONS_SEARCH_URL
+    payload = {"query": {"filter": {}}}
+    if customer_id:
+        payload["query"]["filter"]["customer_ids"] = [customer_id]
+
+    # NOTE: "statuses" filter causes 400 Bad Request on some tokens/versions.
+    # We fetch all and filter in Python.
+
+    if cursor:
+        payload["cursor"] = cursor
+
+    response = _session.post(url, json=payload, timeout=10)
+
+    if response.status_code != 200:
+        return {"success": False, "error": response.text, "subscriptions": []}
+
+    data = _parse(response)
+    all_subs = data.get("subscriptions", [])
+
+    # Filter by status if provided
+    filtered_subs = all_subs
+    if status:
+        filtered_subs = [s for s in all_subs if s.get("status") == status]
+
+    return {
+        "success": True,
+        "subscriptions": filtered_subs,
+        "cursor": data.get("cursor")
+    }
 
-def search_subscriptions(status: Optional[str] = None) -> Dict[str, Any]:
+def iter_subscriptions(customer_id: Optional[str] = None, status: Optional[str] = None):
+    """Yield subscriptions one at a time, following Square's cursor.
+
+    Lazy like iter_customer_invoices: callers that break early never pay
+    for the remaining pages. Stops quietly on a failed page (the error has
+    already been logged by get_subscriptions).
     """
-    Compatibility wrapper for admin.py using get_subscriptions.
+    cursor = None
+    while True:
+        page = get_subscriptions(customer_id=customer_id, status=status, cursor=cursor)
+        if not page.get("success"):
+            return
+        yield from page.get("subscriptions", [])
+        cursor = page.get("cursor")
+        if not cursor:
+            return
+
+def search_subscriptions(status: Optional[str] = None) -> SubscriptionListResult:
     """
-    return get_subscriptions(status=status)
+    Compatibility wrapper for admin.py using get_subscriptions.
 
+    Aggregates every page - the single-page version silently undercounted
+    admin stats once the account grew past one cursor page.
+    """
+    subscriptions = []
+    cursor = None
+    while True:
+        page = get_subscriptions(status=status, cursor=cursor)
+        if not page.get("success"):
+            # Surface the failure if we have nothing; otherwise return what
+            # we collected rather than dropping the earlier pages.
+            if not subscriptions:
+                return page
+            break
+        subscriptions.extend(page.get("subscriptions", []))
+        cursor = page.get("cursor")
+        if not cursor:
+            break
+    return {"success": True, "subscriptions": subscriptions, "cursor": None}
+
+@square_call()
 def cancel_subscription(subscription_id: str) -> Dict[str, Any]:
     """Cancel a subscription in Square."""
-    try:
-        url = f"{get_square_base_url()}/v2/subscriptions/{subscription_id}/cancel"
-        headers = get_square_headers()
-        response = requests.post(url, headers=headers, timeout=10)
-        data = response.json()
-        if "subscription" in data:
-            return {"success": True, "subscription": data["subscription"]}
-        return {"success": False, "error": str(data.get("errors", "Unknown error"))}
-    except Exception as e:
-        return {"success": False, "error": str(e)}
-
+    url = f"{_SUBSCRIPTIONS_URL}/{subscription_id}/cancel"
+    response = _session.post(url, timeout=10)
+    data = response.json()
+    if "subscription" in data:
+        return {"success": True, "subscription": data["subscription"]}
+    return {"success": False, "error": str(data.get("errors", "Unknown error"))}
+
+@square_call()
 def retrieve_subscription(subscription_id: str) -> Dict[str, Any]:
     """Retrieve a single subscription by ID."""
-    try:
-        url = f"{get_square_base_url()}/v2/subscriptions/{subscription_id}"
-        headers = get_square_headers()
-        response = requests.get(url, headers=headers, timeout=10)
-        data = response.json()
-        if "subscription" in data:
-            return {"success": True, "subscription": data["subscription"]}
-        return {"success": False, "error": str(data.get("errors", "Unknown error"))}
-    except Exception as e:
-        return {"success": False, "error": str(e)}
-
+    url = f"{_SUBSCRIPTIONS_URL}/{subscription_id}"
+    response = _session.get(url, timeout=10)
+    data = response.json()
+    if "subscription" in data:
+        return {"success": True, "subscription": data["subscription"]}
+    return {"success": False, "error": str(data.get("errors", "Unknown error"))}
+
+@square_call()
 def swap_subscription_plan(subscription_id: str, new_plan_variation_id: str) -> Dict[str, Any]:
     """Swap subscription plan in Square using swap-plan endpoint."""
-    try:
-        url = f"{get_square_base_url()}/v2/subscriptions/{subscription_id}/swap-plan"
-        headers = get_square_headers()
-        payload = {"new_plan_variation_id": new_plan_variation_id}
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
-        data = response.json()
-        if "subscription" in data:
-            return {"success": True, "subscription": data["subscription"]}
-        return {"success": False, "error": str(data.get("errors", "Unknown error"))}
-    except Exception as e:
-        return {"success": False, "error": str(e)}
-
+    url = f"{_SUBSCRIPTIONS_URL}/{subscription_id}/swap-plan"
+    payload = {"new_plan_variation_id": new_plan_variation_id}
+    response = _session.post(url, json=payload, timeout=10)
+    data = response.json()
+    if "subscription" in data:
+        return {"success": True, "subscription": data["subscription"]}
+    return {"success": False, "error": str(data.get("errors", "Unknown error"))}
+
+@square_call()
 def update_subscription(subscription_id: str, plan_variation_id: Optional[str] = None, order_template_id: Optional[str] = None, card_id: Optional[str] = None) -> Dict[str, Any]:
     """Update subscription details in Square using the general UpdateSubscription endpoint."""
-    try:
-        url = f"{get_square_base_url()}/v2/subscriptions/{subscription_id}"
-        headers = get_square_headers()
-        
-        subscription_data = {}
-        if plan_variation_id:
-            subscription_data["plan_variation_id"] = plan_variation_id
-        if order_template_id:
-            subscription_data["order_template_id"] = order_template_id
-        if card_id:
-            subscription_data["card_id"] = card_id
-            
-        if not subscription_data:
-            return {"success": False, "error": "No update fields provided"}
-            
-        payload = {"subscription": subscription_data}
-        response = requests.put(url, json=payload, headers=headers, timeout=10)
-        data = response.json()
-        if "subscription" in data:
-            return {"success": True, "subscription": data["subscription"]}
-        return {"success": False, "error": str(data.get("errors", "Unknown error"))}
-    except Exception as e:
-        logger.error(f"Error updating subscription: {str(e)}")
-        return {"success": False, "error": str(e)}
-
+    url = f"{_SUBSCRIPTIONS_URL}/{subscription_id}"
+    subscription_data = {}
+    if plan_variation_id:
+        subscription_data["plan_variation_id"] = plan_variation_id
+    if order_template_id:
+        subscription_data["order_template_id"] = order_template_id
+    if card_id:
+        subscription_data["card_id"] = card_id
+
+    if not subscription_data:
+        return {"success": False, "error": "No update fields provided"}
+
+    payload = {"subscription": subscription_data}
+    response = _session.put(url, json=payload, timeout=10)
+    data = response.json()
+    if "subscription" in data:
+        return {"success": True, "subscription": data["subscription"]}
+    return {"success": False, "error": str(data.get("errors", "Unknown error"))}
+
+@square_call()
 def update_subscription_card(subscription_id: str, card_id: str) -> Dict[str, Any]:
     """Update the payment card for a subscription in Square."""
-    try:
-        url = f"{get_square_base_url()}/v2/subscriptions/{subscription_id}"
-        headers = get_square_headers()
-        payload = {
-            "subscription": {
-                "card_id": card_id
-            }
+    url = f"{_SUBSCRIPTIONS_URL}/{subscription_id}"
+    payload = {
+        "subscription": {
+            "card_id": card_id
         }
-        # Note: According to Square API, this is a PUT to update the subscription
-        response = requests.put(url, json=payload, headers=headers, timeout=10)
-        data = response.json()
-        if "subscription" in data:
-            return {"success": True, "subscription": data["subscription"]}
-        return {"success": False, "error": str(data.get("errors", "Unknown error"))}
-    except Exception as e:
-        logger.error(f"Error updating subscription card: {str(e)}")
-        return {"success": False, "error": str(e)}
-
+    }
+    # Note: According to Square API, this is a PUT to update the subscription
+    response = _session.put(url, json=payload, timeout=10)
+    data = response.json()
+    if "subscription" in data:
+        return {"success": True, "subscription": data["subscription"]}
+    return {"success": False, "error": str(data.get("errors", "Unknown error"))}
+
+@square_call(shape="errors")
 def pause_subscription(subscription_id: str) -> Dict[str, Any]:
     """Pause a subscription in Square."""
-    try:
-        url = f"{get_square_base_url()}/v2/subscriptions/{subscription_id}/pause"
-        headers = get_square_headers()
-        response = requests.post(url, json={}, headers=headers, timeout=10)
-        return response.json()
-    except Exception as e:
-        return {"errors": [{"detail": str(e)}]}
+    url = f"{_SUBSCRIPTIONS_URL}/{subscription_id}/pause"
+    response = _session.post(url, json={}, timeout=10)
+    return response.json()
 
+@square_call(shape="both")
 def resume_subscription(subscription_id: str, resume_date: Optional[str] = None) -> Dict[str, Any]:
     """Resume a subscription in Square.
-    
+
     Args:
         subscription_id: The Square subscription ID to resume.
         resume_date: Optional date string (YYYY-MM-DD). Defaults to today.
     """
-    try:
-        from datetime import date as date_cls
-        url = f"{get_square_base_url()}/v2/subscriptions/{subscription_id}/resume"
-        headers = get_square_headers()
-        payload = {
-            "resume_effective_date": resume_date or str(date_cls.today()),
-            "resume_change_timing": "IMMEDIATE"
-        }
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
-        data = response.json()
-        if "subscription" in data:
-            return {"success": True, "subscription": data["subscription"]}
-        return {"success": False, "errors": data.get("errors", []), "error": str(data.get("errors", "Unknown error"))}
-    except Exception as e:
-        return {"success": False, "errors": [{"detail": str(e)}], "error": str(e)}
+    url = f"{_SUBSCRIPTIONS_URL}/{subscription_id}/resume"
+    payload = {
+        "resume_effective_date": resume_date or str(date.today()),
+        "resume_change_timing": "IMMEDIATE"
+    }
+    response = _session.post(url, json=payload, timeout=10)
+    data = response.json()
+    if "subscription" in data:
+        return {"success": True, "subscription": data["subscription"]}
+    return {"success": False, "errors": data.get("errors", []), "error": str(data.get("errors", "Unknown error"))}
 
 # --- Invoice Operations ---
 
-def get_customer_invoices(customer_id: str, location_id: Optional[str] = None, limit: Optional[int] = None) -> Dict[str, Any]:
-    """Fetch invoices for a customer using robust search."""
-    try:
-        url = f"{get_square_base_url()}/v2/invoices/search"
-        headers = get_square_headers()
-        
-        loc_id = location_id or SQUARE_LOCATION_ID
-        
-        payload = {
-            "query": {
-                "filter": {
-                    "customer_ids": [customer_id]
-                },
-                "sort": {
-                    "field": "INVOICE_SORT_DATE",
-                    "order": "DESC"
-                }
-            }
-        }
-        
-        if loc_id:
-             payload["query"]["filter"]["location_ids"] = [loc_id]
-        if limit:
-            payload["limit"] = limit
-            
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
-        
-        if response.status_code != 200:
-            return {"success": False, "error": response.text, "invoices": []}
-        
-        data = response.json()
-        return {
-            "success": True, 
-            "invoices": data.get("invoices", []), 
-            "errors": data.get("errors", [])
-        }
-    except Exception as e:
-        logger.error(f"Error fetching invoices: {str(e)}")
-        return {"success": False, "error": str(e)}
-def search_invoices(customer_id: str, location_id: Optional[str] = None) -> Dict[str, Any]:
-    """Search for invoices belonging to a specific customer using Square Invoices API."""
-    try:
-        url = f"{get_square_base_url()}/v2/invoices/search"
-        headers = get_square_headers()
-        curr_location_id = location_id or SQUARE_LOCATION_ID
-        
-        payload = {
-            "query": {
-                "filter": {
-                    "location_ids": [curr_location_id],
-                    "customer_ids": [customer_id]
-                },
-                "sort": {
-                    "field": "INVOICE_SORT_DATE",
-                    "order": "DESC"
-                }
+def _invoice_search_payload(customer_id: str, location_id: Optional[str]) -> Dict[str, Any]:
+    """Build the standard newest-first invoice search payload.
+
+    The payload is assembled fresh each call (it's a handful of small
+    dicts - cheaper than deep-copying a shared template), so callers can
+    attach limit/cursor keys without affecting anyone else.
+    """
+    loc_id = location_id or SQUARE_LOCATION_ID
+    payload = {
+        "query": {
+            "filter": {
+                "customer_ids": [customer_id]
+            },
+            "sort": {
+                "field": "INVOICE_SORT_DATE",
+                "order": "DESC"
             }
         }
-        
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
-        data = response.json()
-        
-        if response.status_code == 200:
-            return {"success": True, "invoices": data.get("invoices", [])}
-        
-        return {"success": False, "error": str(data.get("errors", "Unknown error fetching invoices"))}
-    except Exception as e:
-        logger.error(f"Error searching invoices: {str(e)}")
-        return {"success": False, "error": str(e)}
+    }
+    if loc_id:
+        payload["query"]["filter"]["location_ids"] = [loc_id]
+    return payload
+
+@square_call()
+def get_customer_invoices(customer_id: str, location_id: Optional[str] = None, limit: Optional[int] = None) -> InvoiceListResult:
+    """Fetch invoices for a customer using robust search."""
+    url = _INVOICES_SEARCH_URL
+    payload = _invoice_search_payload(customer_id, location_id)
+    if limit:
+        payload["limit"] = limit
+
+    response = _session.post(url, json=payload, timeout=10)
+
+    if response.status_code != 200:
+        return {"success": False, "error": response.text, "invoices": []}
+
+    data = _parse(response)
+    return {
+        "success": True,
+        "invoices": data.get("invoices", []),
+        "errors": data.get("errors", [])
+    }
+
+def iter_customer_invoices(customer_id: str, location_id: Optional[str] = None, page_size: int = 100):
+    """Yield a customer's invoices one at a time, pumping Square's cursor.
+
+    Callers that only want the first page (dashboards, recent-activity
+    widgets) can stop iterating early and never pay for the later pages;
+    full exports walk every page without holding them all in memory.
+    """
+    url = _INVOICES_SEARCH_URL
+    payload = _invoice_search_payload(customer_id, location_id)
+    payload["limit"] = page_size
+
+    while True:
+        try:
+            response = _session.post(url, json=payload, timeout=10)
+            if response.status_code != 200:
+                logger.error("Error iterating invoices: %s", response.text)
+                return
+            data = _parse(response)
+        except Exception as e:
+            logger.error("Error iterating invoices: %s", e)
+            return
+
+        yield from data.get("invoices", [])
+
+        cursor = data.get("cursor")
+        if not cursor:
+            return
+        payload["cursor"] = cursor
+
+def search_invoices(customer_id: str, location_id: Optional[str] = None) -> InvoiceListResult:
+    """Search for invoices belonging to a specific customer.
+
+    Alias for get_customer_invoices, kept for existing callers - the two
+    grew up separately but always meant the same query.
+    """
+    return get_customer_invoices(customer_id, location_id)
+
+# --- Bulk Operations ---
+
+# Shared pool for fanning independent Square lookups out in parallel. The
+# calls are I/O-bound (the GIL is released while waiting on the socket), so
+# a modest thread count overlaps the network round-trips; the session above
+# is thread-safe and its connection pool is sized to match.
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="square")
+
+def get_customer_invoices_bulk(customer_ids: List[str], location_id: Optional[str] = None) -> Dict[str, InvoiceListResult]:
+    """Fetch invoices for many customers concurrently.
+
+    Returns {customer_id: result} where each result has the same shape as
+    get_customer_invoices.
+    """
+    if not customer_ids:
+        return {}
+    results = _executor.map(lambda cid: get_customer_invoices(cid, location_id), customer_ids)
+    return dict(zip(customer_ids, results))
+
+def get_subscriptions_bulk(customer_ids: List[str]) -> Dict[str, SubscriptionListResult]:
+    """Fetch subscriptions for many customers concurrently.
+
+    Returns {customer_id: result} where each result has the same shape as
+    get_subscriptions.
+    """
+    if not customer_ids:
+        return {}
+    results = _executor.map(get_subscriptions, customer_ids)
+    return dict(zip(customer_ids, results))
@@ -1,10 +1,90 @@
 import os
+import threading
 import uuid
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+
+from cachetools import TTLCache
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
 from models.subscription import ItemVariation, SubscriptionPlan
 from utils.square_client import get_catalog_prices, create_order
 
+# Plan and item metadata is read on every order build but only changes when
+# an admin edits the plan tables. Entries hold plain values (never ORM rows,
+# so nothing outlives its session), keyed by the plan variation plus the
+# selected addon set. 60s is short enough that admin edits show up quickly;
+# call invalidate_plan_cache() to make them immediate. TTLCache isn't
+# thread-safe, so mutations go through the lock; misses are double-checked
+# under it so concurrent requests for the same plan share one load.
+_plan_meta_cache = TTLCache(maxsize=512, ttl=60)
+_plan_meta_lock = threading.Lock()
+
+def invalidate_plan_cache() -> None:
+    """Drop cached plan/item metadata after the plan tables change."""
+    with _plan_meta_lock:
+        _plan_meta_cache.clear()
+
+def _load_plan_meta(db: Session, plan_variation_id: str, addons_key: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+    """Load the DB metadata needed to build an order, cached for 60s.
+
+    Returns a dict of plain values:
+        plan_name, plan_cost, plan_item_vid,
+        addons: list of (variation_id, price),
+        fee_vid: fee row variation_id or None
+    or an {"error": ...} dict when the plan rows are missing (not cached).
+    """
+    key = (plan_variation_id, addons_key)
+    cached = _plan_meta_cache.get(key)
+    if cached is not None:
+        return cached
+    with _plan_meta_lock:
+        # Re-check under the lock: another thread may have just filled it
+        cached = _plan_meta_cache.get(key)
+        if cached is not None:
+            return cached
+        return _fetch_plan_meta(db, key, plan_variation_id, addons_key)
+
+def _fetch_plan_meta(db: Session, key, plan_variation_id: str, addons_key: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+    # 1. Fetch Plan Details from DB
+    plan_db = db.query(SubscriptionPlan).filter(SubscriptionPlan.plan_variation_id == plan_variation_id).first()
+    if not plan_db:
+        return {"error": f"Subscription plan for variation '{plan_variation_id}' not found in database."}
+
+    # 2. Fetch every ItemVariation we need in one query: the plan's order
+    # item, any selected addons, and the fee row. These were three separate
+    # round-trips before; one OR'd filter and a single pass over the rows
+    # buckets them just as well.
+    conditions = [
+        and_(ItemVariation.item_type == "PLAN", ItemVariation.name == plan_db.plan_name),
+        ItemVariation.item_type == "FEE",
+    ]
+    if addons_key:
+        conditions.append(and_(ItemVariation.item_type == "ADDON", ItemVariation.variation_id.in_(addons_key)))
+
+    plan_item = None
+    fee_item = None
+    db_addons = []
+    for item in db.query(ItemVariation).filter(or_(*conditions)):
+        if item.item_type == "PLAN" and plan_item is None:
+            plan_item = item
+        elif item.item_type == "FEE" and fee_item is None:
+            fee_item = item
+        elif item.item_type == "ADDON":
+            db_addons.append(item)
+
+    if not plan_item:
+        return {"error": f"Order template item for plan '{plan_db.plan_name}' not found."}
+
+    meta = {
+        "plan_name": plan_db.plan_name,
+        "plan_cost": plan_db.plan_cost,
+        "plan_item_vid": plan_item.variation_id,
+        "addons": [(a.variation_id, a.price or 0.0) for a in db_addons],
+        "fee_vid": fee_item.variation_id if fee_item else None,
+    }
+    _plan_meta_cache[key] = meta
+    return meta
+
 def prepare_subscription_order_items(db: Session, plan_variation_id: str, addons: Optional[List[str]] = None) -> Dict[str, Any]:
     """
     Unified logic to prepare line items and calculate totals for a subscription order template.
@@ -15,66 +95,54 @@ def prepare_subscription_order_items(db: Session, plan_variation_id: str, addons
         "total_amount": float
     }
     """
-    # 1. Fetch Plan Details from DB
-    plan_db = db.query(SubscriptionPlan).filter(SubscriptionPlan.plan_variation_id == plan_variation_id).first()
-    if not plan_db:
-        return {"success": False, "error": f"Subscription plan for variation '{plan_variation_id}' not found in database."}
-
-    # 2. Fetch the corresponding Order Item Variation ID for this plan
-    plan_item = db.query(ItemVariation).filter(
-        ItemVariation.item_type == "PLAN",
-        ItemVariation.name == plan_db.plan_name
-    ).first()
-    
-    if not plan_item:
-        return {"success": False, "error": f"Order template item for plan '{plan_db.plan_name}' not found."}
+    addons_key = tuple(sorted(addons)) if addons else ()
+    meta = _load_plan_meta(db, plan_variation_id, addons_key)
+    if "error" in meta:
+        return {"success": False, "error": meta["error"]}
 
     # 3. Prepare Line Items
     line_items = [
         {
             "quantity": "1",
-            "catalog_object_id": plan_item.variation_id
+            "catalog_object_id": meta["plan_item_vid"]
         }
     ]
-    
-    all_variation_ids = [plan_item.variation_id]
 
-    if addons:
-        db_addons = db.query(ItemVariation).filter(
-            ItemVariation.item_type == "ADDON",
-            ItemVariation.variation_id.in_(addons)
-        ).all()
-        
-        for addon in db_addons:
-            line_items.append({
-                "quantity": "1",
-                "catalog_object_id": addon.variation_id
-            })
-            all_variation_ids.append(addon.variation_id)
-            
+    all_variation_ids = [meta["plan_item_vid"]]
+
+    for addon_vid, _ in meta["addons"]:
+        line_items.append({
+            "quantity": "1",
+            "catalog_object_id": addon_vid
+        })
+        all_variation_ids.append(addon_vid)
+
     # 4. Fetch Prices for calculation
     prices = get_catalog_prices(all_variation_ids)
-    
+
     # Calculate subtotal
-    subtotal = plan_db.plan_cost
+    subtotal = meta["plan_cost"]
     if addons:
+        db_prices = dict(meta["addons"])
         for vid in addons:
             sq_price = prices.get(vid, 0)
             if sq_price > 0:
                 subtotal += sq_price
             else:
-                addon_db = next((a for a in db_addons if a.variation_id == vid), None)
-                if addon_db:
-                    subtotal += (addon_db.price or 0.0)
-    
-    # 5. Add Processing Fee
-    processing_fee = round((subtotal * 0.040) + 0.10, 2)
-    processing_fee_cents = int(processing_fee * 100)
-    
-    fee_item = db.query(ItemVariation).filter(ItemVariation.item_type == "FEE").first()
-    if fee_item and fee_item.variation_id != "PROCESSING_FEE_PLACEHOLDER":
+                subtotal += db_prices.get(vid, 0.0)
+
+    # 5. Add Processing Fee - computed in integer cents: 4% of the subtotal
+    # (rounded half-up at the cent) plus a flat 10 cents. The old float
+    # expression could land a cent off when int() truncated a value like
+    # 12.299999999999999 after the round-trip through round().
+    subtotal_cents = int(round(subtotal * 100))
+    processing_fee_cents = (subtotal_cents * 4 + 50) // 100 + 10
+    processing_fee = processing_fee_cents / 100.0
+
+    fee_vid = meta["fee_vid"]
+    if fee_vid and fee_vid != "PROCESSING_FEE_PLACEHOLDER":
         line_items.append({
-            "catalog_object_id": fee_item.variation_id,
+            "catalog_object_id": fee_vid,
             "quantity": "1",
             "base_price_money": {
                 "amount": processing_fee_cents,
@@ -90,7 +158,7 @@ def prepare_subscription_order_items(db: Session, plan_variation_id: str, addons
                 "currency": "USD"
             }
         })
-        
+
     return {
         "success": True,
         "line_items": line_items,
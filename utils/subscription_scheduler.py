@@ -4,9 +4,14 @@ Subscription Scheduler Utility
 Handles automatic pause/resume of subscriptions based on plan schedules.
 This should be run at the start of each month (e.g., via cron job or scheduled task).
 """
+import calendar
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, NamedTuple
+
+from cachetools import TTLCache
 from sqlalchemy.orm import Session
 
 from db.init import SessionLocal
@@ -17,27 +22,66 @@ from utils.square_client import pause_subscription, resume_subscription
 
 logger = logging.getLogger(__name__)
 
-# Month name mapping for logging
-MONTH_NAMES = {
-    1: "January", 2: "February", 3: "March", 4: "April",
-    5: "May", 6: "June", 7: "July", 8: "August",
-    9: "September", 10: "October", 11: "November", 12: "December"
-}
+# Month name lookup for logging - the stdlib already ships this table
+# (calendar.month_name[1] == "January"; index 0 is the empty string)
+MONTH_NAMES = calendar.month_name
+
+
+# The schedule table is a handful of rows that only change when an admin
+# edits them, but every signup consults it (via
+# calculate_subscription_start_date). A 60s cache keeps those reads in
+# memory. Cache plain tuples, never ORM rows: a cached instance expires on
+# the owning session's commit and detaches on close, so the next reader
+# would hit DetachedInstanceError. TTLCache isn't thread-safe and signups
+# hit this from the request threadpool, so mutations go through the lock.
+_schedule_cache = TTLCache(maxsize=1, ttl=60)
+_schedule_lock = threading.Lock()
+
+
+class _CachedSchedule(NamedTuple):
+    """Plain snapshot of a SubscriptionPlanSchedule row, safe to cache."""
+    plan_name: str
+    start_month: int
+    end_month: int
+
+    # Same month-range logic as the model; the method only reads
+    # start_month/end_month, so it binds to this snapshot unchanged.
+    is_month_active = SubscriptionPlanSchedule.is_month_active
 
 
-def get_all_plan_schedules(db: Session) -> List[SubscriptionPlanSchedule]:
-    """Fetch all subscription plan schedules from the database."""
-    return db.query(SubscriptionPlanSchedule).all()
+def get_all_plan_schedules(db: Session) -> List[_CachedSchedule]:
+    """Fetch all subscription plan schedules (cached for 60 seconds)."""
+    schedules = _schedule_cache.get("all")
+    if schedules is not None:
+        return schedules
+    with _schedule_lock:
+        # Re-check under the lock: another thread may have just filled it
+        schedules = _schedule_cache.get("all")
+        if schedules is None:
+            schedules = [
+                _CachedSchedule(plan_name, start_month, end_month)
+                for plan_name, start_month, end_month in db.query(
+                    SubscriptionPlanSchedule.plan_name,
+                    SubscriptionPlanSchedule.start_month,
+                    SubscriptionPlanSchedule.end_month
+                )
+            ]
+            _schedule_cache["all"] = schedules
+        return schedules
 
 
-def get_schedule_for_plan(db: Session, plan_name: str) -> SubscriptionPlanSchedule:
+def get_schedule_for_plan(db: Session, plan_name: str) -> _CachedSchedule:
     """Get the schedule for a specific plan by name (case-insensitive partial match)."""
-    return db.query(SubscriptionPlanSchedule).filter(
-        SubscriptionPlanSchedule.plan_name.ilike(f"%{plan_name}%")
-    ).first()
+    # Scan the cached list instead of issuing an ilike query per call -
+    # same contains-match the ilike('%name%') filter performed.
+    needle = plan_name.lower()
+    for schedule in get_all_plan_schedules(db):
+        if needle in schedule.plan_name.lower():
+            return schedule
+    return None
 
 
-def is_plan_active_for_month(schedule: SubscriptionPlanSchedule, month: int) -> bool:
+def is_plan_active_for_month(schedule: _CachedSchedule, month: int) -> bool:
     """Check if a plan is active for the given month (1-12)."""
     if not schedule:
         return True  # If no schedule found, assume always active
@@ -53,120 +97,230 @@ def get_customers_with_plan(db: Session, plan_name: str) -> List[Customer]:
     ).all()
 
 
-def process_monthly_subscription_schedules(dry_run: bool = False) -> Dict[str, Any]:
+def _execute_square_actions(actions: List[tuple]) -> List[Dict[str, Any]]:
+    """Run collected (action, customer, plan) tuples against Square.
+
+    The pause/resume calls are independent of each other, so they are
+    fanned out through the async client instead of serialized one
+    round-trip at a time. Falls back to sequential sync calls when
+    aiohttp isn't installed. Results come back in the same order as
+    the actions.
+    """
+    if not actions:
+        return []
+
+    try:
+        import asyncio
+        from utils.async_square_client import AsyncSquareClient
+    except ImportError:
+        # No aiohttp - overlap the round-trips with threads instead of
+        # degrading to one blocking call at a time. The calls are pure
+        # I/O, so the GIL isn't a factor.
+        def _dispatch(entry):
+            action, customer, _ = entry
+            if action == "pause":
+                return pause_subscription(customer.square_subscription_id)
+            return resume_subscription(customer.square_subscription_id)
+
+        with ThreadPoolExecutor(max_workers=min(len(actions), 16)) as executor:
+            return list(executor.map(_dispatch, actions))
+
+    async def _run():
+        async with AsyncSquareClient() as client:
+            return await asyncio.gather(*[
+                client.pause_subscription(customer.square_subscription_id) if action == "pause"
+                else client.resume_subscription(customer.square_subscription_id)
+                for action, customer, _ in actions
+            ])
+
+    return asyncio.run(_run())
+
+
+
+# Worker pool for fire-and-forget scheduler runs. Small and module-level so
+# queued work survives the scheduler function returning; there's no broker
+# in this stack, so an in-process pool is the whole queue.
+_side_effect_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="sched")
+
+
+def apply_subscription_action(action: str, subscription_id: str, customer_id: int) -> Dict[str, Any]:
+    """Apply one queued pause/resume against Square and record the outcome.
+
+    Runs on a worker thread, so it opens its own session rather than
+    sharing the scheduler's. Both Square calls are idempotent, which is
+    what makes deferring them safe: a crashed worker just means the next
+    scheduler run re-queues the same action.
+    """
+    if action == "pause":
+        res = pause_subscription(subscription_id)
+    else:
+        res = resume_subscription(subscription_id)
+
+    if "errors" in res:
+        logger.error("Queued %s for subscription %s failed: %s", action, subscription_id, res["errors"])
+        return res
+
+    db = SessionLocal()
+    try:
+        customer = db.get(Customer, customer_id)
+        if customer:
+            if action == "pause":
+                customer.subscription_status = "PAUSED"
+                customer.subscription_paused_by_schedule = True
+            else:
+                customer.subscription_status = "ACTIVE"
+                customer.subscription_paused_by_schedule = False
+            db.commit()
+    finally:
+        db.close()
+    return res
+
+
+def process_monthly_subscription_schedules(dry_run: bool = False, fire_and_forget: bool = False) -> Dict[str, Any]:
     """
     Main function to process subscription schedules for the current month.
-    
+
     Args:
         dry_run: If True, only log what would happen without making changes
-        
+        fire_and_forget: If True, queue the Square calls on a worker pool
+            and return immediately with {"queued": N} instead of waiting
+            for every round-trip to finish
+
     Returns:
         Dict with counts of paused and resumed subscriptions
     """
     db = SessionLocal()
+    # Read the clock once so the whole run agrees on the month, even if it
+    # happens to span midnight on the 1st
+    current_month = datetime.now().month
     results = {
-        "current_month": datetime.now().month,
-        "month_name": MONTH_NAMES[datetime.now().month],
+        "current_month": current_month,
+        "month_name": MONTH_NAMES[current_month],
         "paused": [],
         "resumed": [],
         "errors": [],
         "dry_run": dry_run
     }
-    
+
     try:
-        current_month = datetime.now().month
         schedules = get_all_plan_schedules(db)
         
         logger.info(f"Processing subscription schedules for {MONTH_NAMES[current_month]}...")
         logger.info(f"Found {len(schedules)} plan schedules to process")
         
+        # Phase 1: walk the schedules and decide what needs to happen.
+        # Nothing touches Square here, so the matching logic stays simple
+        # and dry runs share exactly the code path that real runs use.
+        # Two queries for the whole run: every subscribed customer once,
+        # and one id->name map for the plans. The old version re-fetched
+        # all customers for each schedule and then looked up each
+        # customer's plan row individually (a classic N+1).
+        customer_query = db.query(Customer).filter(
+            Customer.square_subscription_id.isnot(None)
+        )
+        # Most months nothing goes inactive, so no pause is possible and
+        # the only candidates are resumes - customers we previously paused
+        # by schedule. Narrowing the query to those keeps the common no-op
+        # run from loading the whole customer table.
+        any_inactive = any(not is_plan_active_for_month(s, current_month) for s in schedules)
+        if not any_inactive:
+            customer_query = customer_query.filter(Customer.subscription_paused_by_schedule == True)
+        customers = customer_query.all()
+        plan_names = {
+            plan_id: plan_name
+            for plan_id, plan_name in db.query(SubscriptionPlan.id, SubscriptionPlan.plan_name)
+        }
+        plan_names_str = {str(plan_id): name for plan_id, name in plan_names.items()}
+
+        # Resolve and lowercase each customer's plan name once. The typed
+        # plan_id_int column resolves directly; rows predating the backfill
+        # fall back to the legacy string lookup, and anything non-numeric is
+        # treated as the plan name itself (as before). Customers without a
+        # plan can never match and are dropped here rather than re-skipped
+        # per schedule.
+        matchable = []
+        for customer in customers:
+            customer_plan = plan_names.get(customer.plan_id_int)
+            if customer_plan is None:
+                if not customer.plan_id:
+                    continue
+                customer_plan = plan_names_str.get(customer.plan_id, customer.plan_id)
+            matchable.append((customer, customer_plan, customer_plan.lower()))
+
+        actions = []  # (action, customer, customer_plan)
         for schedule in schedules:
             plan_active = is_plan_active_for_month(schedule, current_month)
             logger.info(f"Plan '{schedule.plan_name}': Active={plan_active} (months {schedule.start_month}-{schedule.end_month})")
-            
-            # Get customers with this plan
-            # Match by checking if plan_id contains the plan name
-            customers = db.query(Customer).filter(
-                Customer.square_subscription_id.isnot(None)
-            ).all()
-            
-            for customer in customers:
-                # Check if customer's plan matches this schedule
-                customer_plan = None
-                if customer.plan_id:
-                    # Try to find matching plan
-                    plan = db.query(SubscriptionPlan).filter(
-                        SubscriptionPlan.id == int(customer.plan_id)
-                    ).first() if customer.plan_id.isdigit() else None
-                    
-                    if plan:
-                        customer_plan = plan.plan_name
-                    else:
-                        customer_plan = customer.plan_id
-                
-                if not customer_plan or schedule.plan_name.lower() not in customer_plan.lower():
+
+            schedule_key = schedule.plan_name.lower()
+            for customer, customer_plan, plan_lower in matchable:
+                if schedule_key not in plan_lower:
                     continue
-                
+
                 logger.info(f"Processing customer {customer.id} ({customer.email}) with plan '{customer_plan}'")
-                
+
                 if not plan_active and customer.subscription_status == "ACTIVE":
                     # Plan is inactive this month - PAUSE the subscription
-                    logger.info(f"  -> Pausing subscription {customer.square_subscription_id}")
-                    
-                    if not dry_run:
-                        res = pause_subscription(customer.square_subscription_id)
-                        if "errors" not in res:
-                            customer.subscription_status = "PAUSED"
-                            customer.subscription_paused_by_schedule = True
-                            db.commit()
-                            results["paused"].append({
-                                "customer_id": customer.id,
-                                "email": customer.email,
-                                "plan": customer_plan
-                            })
-                        else:
-                            results["errors"].append({
-                                "customer_id": customer.id,
-                                "action": "pause",
-                                "error": str(res["errors"])
-                            })
-                    else:
-                        results["paused"].append({
-                            "customer_id": customer.id,
-                            "email": customer.email,
-                            "plan": customer_plan,
-                            "dry_run": True
-                        })
-                        
+                    logger.info(f"  -> Queueing pause for subscription {customer.square_subscription_id}")
+                    actions.append(("pause", customer, customer_plan))
                 elif plan_active and customer.subscription_status == "PAUSED" and customer.subscription_paused_by_schedule:
                     # Plan is active this month and was paused by schedule - RESUME
-                    logger.info(f"  -> Resuming subscription {customer.square_subscription_id}")
-                    
-                    if not dry_run:
-                        res = resume_subscription(customer.square_subscription_id)
-                        if "errors" not in res:
-                            customer.subscription_status = "ACTIVE"
-                            customer.subscription_paused_by_schedule = False
-                            db.commit()
-                            results["resumed"].append({
-                                "customer_id": customer.id,
-                                "email": customer.email,
-                                "plan": customer_plan
-                            })
-                        else:
-                            results["errors"].append({
-                                "customer_id": customer.id,
-                                "action": "resume",
-                                "error": str(res["errors"])
-                            })
-                    else:
-                        results["resumed"].append({
-                            "customer_id": customer.id,
-                            "email": customer.email,
-                            "plan": customer_plan,
-                            "dry_run": True
-                        })
-        
+                    logger.info(f"  -> Queueing resume for subscription {customer.square_subscription_id}")
+                    actions.append(("resume", customer, customer_plan))
+
+        if dry_run:
+            for action, customer, customer_plan in actions:
+                results["paused" if action == "pause" else "resumed"].append({
+                    "customer_id": customer.id,
+                    "email": customer.email,
+                    "plan": customer_plan,
+                    "dry_run": True
+                })
+            logger.info(f"Scheduler dry run: {len(results['paused'])} to pause, {len(results['resumed'])} to resume")
+            return results
+
+        if fire_and_forget:
+            # Hand the Square calls to the worker pool and return now; each
+            # worker updates its own customer row on completion. The caller
+            # only learns what was queued, not what succeeded - reconcile
+            # from the DB (or the next run) if that matters.
+            for action, customer, customer_plan in actions:
+                _side_effect_executor.submit(
+                    apply_subscription_action, action, customer.square_subscription_id, customer.id
+                )
+            results["queued"] = len(actions)
+            logger.info(f"Scheduler queued {len(actions)} subscription actions")
+            return results
+
+        # Phase 2: fire the Square calls concurrently, then apply each
+        # outcome to the matching customer row.
+        responses = _execute_square_actions(actions)
+        for (action, customer, customer_plan), res in zip(actions, responses):
+            if "errors" not in res:
+                if action == "pause":
+                    customer.subscription_status = "PAUSED"
+                    customer.subscription_paused_by_schedule = True
+                else:
+                    customer.subscription_status = "ACTIVE"
+                    customer.subscription_paused_by_schedule = False
+                results["paused" if action == "pause" else "resumed"].append({
+                    "customer_id": customer.id,
+                    "email": customer.email,
+                    "plan": customer_plan
+                })
+            else:
+                results["errors"].append({
+                    "customer_id": customer.id,
+                    "action": action,
+                    "error": str(res["errors"])
+                })
+
+        # One commit for the whole batch. Each Square call has already
+        # succeeded or failed individually above, so there's no partial
+        # state to protect with per-row commits - only rows whose Square
+        # action succeeded were modified.
+        db.commit()
+
         logger.info(f"Scheduler complete: {len(results['paused'])} paused, {len(results['resumed'])} resumed")
         
     except Exception as e:
@@ -178,7 +332,7 @@ def process_monthly_subscription_schedules(dry_run: bool = False) -> Dict[str, A
     return results
 
 
-def get_next_active_month(schedule: SubscriptionPlanSchedule, from_month: int) -> int:
+def get_next_active_month(schedule: _CachedSchedule, from_month: int) -> int:
     """
     Get the next active month for a plan schedule starting from a given month.
     Returns the next active month (1-12).
@@ -1,7 +1,7 @@
 import os
 import sys
 from datetime import datetime, timedelta
-from sqlalchemy import create_engine, func
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 
 # Add current directory to path
@@ -9,7 +9,6 @@ sys.path.append(os.getcwd())
 
 from db.init import Base
 from models.user import Customer
-from models.subscription import SubscriptionPlan, ItemVariation
 
 # Setup DB Connection (Assuming local sqlite or env vars are set, but usually main.py has logic)
 # We need to see how db.init gets the URL.
@@ -22,61 +21,88 @@ except ImportError:
 
 def verify_analytics():
     db = SessionLocal()
+    # Read-only path: no ORM writes happen here, so skip the autoflush
+    # check before each query and don't expire loaded state on commit.
+    db.autoflush = False
+    db.expire_on_commit = False
     try:
         print("--- Verifying Analytics Logic ---")
         
         # 1. Fetch Necessary Data
-        all_plans = db.query(SubscriptionPlan).all()
-        plan_map = {p.plan_variation_id: p for p in all_plans if p.plan_variation_id}
-        plan_id_map = {str(p.id): p for p in all_plans}
-        
-        print(f"Found {len(all_plans)} subscription plans.")
-
-        all_addons = db.query(ItemVariation).filter(ItemVariation.item_type == "ADDON").all()
-        addon_map = {a.variation_id: a for a in all_addons}
-        print(f"Found {len(all_addons)} addons.")
+        # Prefer the materialized view (scripts/create_mrr_summary_view.py
+        # creates it; cron refreshes it) - that's a handful of
+        # pre-aggregated rows instead of a scan. Fall back to computing
+        # live if the view isn't there yet.
+        rows = None
+        try:
+            rows = db.execute(text(
+                "SELECT tag, name, n, amount FROM mrr_summary"
+            )).fetchall()
+        except Exception:
+            db.rollback()  # failed statement aborts the transaction
 
-        active_customers = db.query(Customer).filter(
-            Customer.subscription_active == True,
-            Customer.subscription_status == "ACTIVE" 
-        ).all()
-        
-        active_sub_count = len(active_customers)
-        print(f"Active Subscribers: {active_sub_count}")
+        # Everything comes back in one round-trip: total + active customer
+        # counts (one scan, FILTER clause), the per-plan MRR aggregate, and
+        # the addon-revenue sum are UNION ALL'd into a single statement
+        # with a tag column, so the DB parses once and the client waits
+        # once. Plan matching mirrors the analytics endpoint
+        # (plan_variation_id, or the legacy string plan_id holding the
+        # plan's integer id); the addon branch unnests each active
+        # customer's selected_addons JSON array and sums price
+        # server-side. (The analytics endpoint counts recurring addons
+        # only; this script has always summed them all.) No-addon rows
+        # store JSON null, not SQL NULL, and unnesting a scalar is an
+        # error - the CASE feeds those rows an empty array instead; a
+        # WHERE guard wouldn't help because the unnest happens in FROM.
+        if rows is None:
+            rows = db.execute(text("""
+            SELECT 'total' AS tag, NULL AS name, COUNT(*)::float8 AS n,
+                   COUNT(*) FILTER (
+                       WHERE subscription_active AND subscription_status = 'ACTIVE'
+                   )::float8 AS amount
+            FROM customers
+            UNION ALL
+            SELECT 'plan', sp.plan_name, COUNT(c.id)::float8, SUM(sp.plan_cost)::float8
+            FROM subscription_plans sp
+            JOIN customers c
+              ON c.plan_variation_id = sp.plan_variation_id
+              OR c.plan_id = CAST(sp.id AS VARCHAR)
+            WHERE c.subscription_active AND c.subscription_status = 'ACTIVE'
+            GROUP BY sp.plan_name
+            UNION ALL
+            SELECT 'addon', NULL, NULL, COALESCE(SUM(iv.price), 0)::float8
+            FROM customers c,
+                 jsonb_array_elements_text(
+                     CASE WHEN jsonb_typeof(c.selected_addons::jsonb) = 'array'
+                          THEN c.selected_addons::jsonb
+                          ELSE '[]'::jsonb END
+                 ) AS a(variation_id)
+            JOIN item_variations iv ON iv.variation_id = a.variation_id
+            WHERE c.subscription_active
+              AND c.subscription_status = 'ACTIVE'
+              AND iv.item_type = 'ADDON'
+            """)).fetchall()
 
         mrr = 0.0
         plan_counts = {}
-        
-        for customer in active_customers:
-            cust_revenue = 0.0
-            p_name = "Unknown"
-            
-            # Plan Cost
-            if customer.plan_variation_id and customer.plan_variation_id in plan_map:
-                plan = plan_map[customer.plan_variation_id]
-                cust_revenue += plan.plan_cost
-                p_name = plan.plan_name
-            elif customer.plan_id and customer.plan_id in plan_id_map:
-                plan = plan_id_map[customer.plan_id]
-                cust_revenue += plan.plan_cost
-                p_name = plan.plan_name
-            
-            # Addon Cost
-            if customer.selected_addons:
-                for addon_id in customer.selected_addons:
-                    if addon_id in addon_map:
-                        cust_revenue += addon_map[addon_id].price
-            
-            mrr += cust_revenue
-            plan_counts[p_name] = plan_counts.get(p_name, 0) + 1
+        total = 0
+        active_sub_count = 0
+        for tag, name, n, amount in rows:
+            if tag == "plan":
+                plan_counts[name] = int(n or 0)
+                mrr += float(amount or 0.0)
+            elif tag == "addon":
+                mrr += float(amount or 0.0)
+            else:  # total (n = all customers, amount = active subscribers)
+                total = int(n or 0)
+                active_sub_count = int(amount or 0)
 
+        print(f"Active Subscribers: {active_sub_count}")
         print(f"Calculated MRR: ${mrr:.2f}")
         print("Plan Distribution:")
         for name, count in plan_counts.items():
             print(f"  - {name}: {count}")
 
-        # Total Customers
-        total = db.query(Customer).count()
         print(f"Total Customers: {total}")
 
     except Exception as e: